@@ -0,0 +1,213 @@
+import bz2
+import gzip
+import io
+import lzma
+import ntpath
+import os
+import tarfile
+import zipfile
+from typing import IO, Iterator, Tuple, Union
+
+# Разделитель пути к архиву и пути файла внутри архива:
+# 'project.tar.xz::opt/1.log'
+MEMBER_SEPARATOR = '::'
+
+COMPRESSED = {'.gz': gzip.open, '.xz': lzma.open, '.lzma': lzma.open,
+              '.bz2': bz2.open}
+
+TAR_SUFFIXES = ('.tar', '.tar.gz', '.tgz', '.tar.xz', '.txz', '.tar.bz2',
+                '.tbz2')
+
+ZIP_SUFFIXES = ('.zip', )
+
+
+class Member:
+    """
+    Файл из tar или zip архива, прочитанный в память при
+    потоковом обходе архива
+
+    Attributes
+    ----------
+    archive: str
+        Путь к архиву
+
+    name: str
+        Путь файла внутри архива
+
+    data: bytes
+        Содержимое файла
+    """
+
+    __slots__ = ('archive', 'name', 'data')
+
+    def __init__(self, archive: str, name: str, data: bytes):
+        self.archive = archive
+        self.name = name
+        self.data = data
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return self.archive + MEMBER_SEPARATOR + self.name
+
+
+Source = Union[str, 'os.PathLike', Member]
+
+
+def is_archive(path: str) -> bool:
+    return str(path).lower().endswith(TAR_SUFFIXES + ZIP_SUFFIXES)
+
+
+def split_source(source: Source) -> Tuple[str, Union[str, None]]:
+    """
+    Разделяет источник на путь к файлу на диске и путь внутри архива
+
+    Example
+    -------
+    >>> split_source('project.tar.xz::opt/1.log')
+    ('project.tar.xz', 'opt/1.log')
+    >>> split_source('1.log')
+    ('1.log', None)
+    """
+    if isinstance(source, Member):
+        return source.archive, source.name
+    source = os.fspath(source)
+    if MEMBER_SEPARATOR in source:
+        archive, name = source.split(MEMBER_SEPARATOR, 1)
+        return archive, name
+    return source, None
+
+
+def is_plain_file(source: Source) -> bool:
+    """
+    True, если источник - обычный несжатый файл на диске,
+    только такие файлы можно отобразить в память
+    """
+    if isinstance(source, Member):
+        return False
+    path = os.fspath(source)
+    return (MEMBER_SEPARATOR not in path
+            and os.path.splitext(path)[1].lower() not in COMPRESSED)
+
+
+def _read_member(archive: str, name: str) -> bytes:
+    if archive.lower().endswith(ZIP_SUFFIXES):
+        with zipfile.ZipFile(archive) as zip_file:
+            return zip_file.read(name)
+    with tarfile.open(archive, 'r:*') as tar:
+        member = tar.extractfile(name)
+        if member is None:
+            raise IsADirectoryError(f'{name} in {archive} is not a file')
+        return member.read()
+
+
+def open_binary(source: Source) -> IO[bytes]:
+    """
+    Открывает источник на чтение в бинарном режиме. Сжатые файлы
+    (.gz, .xz, .bz2) распаковываются на лету, файлы из архивов
+    ('archive.tar.xz::member') читаются в память без распаковки на диск
+    """
+    archive, name = split_source(source)
+    if isinstance(source, Member):
+        data_file = io.BytesIO(source.data)
+    elif name is not None:
+        data_file = io.BytesIO(_read_member(archive, name))
+    else:
+        data_file = None
+    # Сжатый файл может лежать и внутри архива
+    suffix = os.path.splitext(name if name is not None else archive)[1]
+    opener = COMPRESSED.get(suffix.lower())
+    if data_file is None:
+        return opener(archive, 'rb') if opener else open(archive, 'rb')
+    return opener(data_file, 'rb') if opener else data_file
+
+
+def open_text(source: Source) -> IO[str]:
+    """
+    Аналог open(source, 'r') для всех поддерживаемых источников
+    """
+    if is_plain_file(source):
+        return open(source, 'r')
+    return io.TextIOWrapper(open_binary(source),
+                            encoding='utf-8',
+                            errors='replace')
+
+
+def iter_members(archive: str) -> Iterator[Member]:
+    """
+    Потоковый обход tar или zip архива, каждый файл читается в память
+    по одному, архив распаковывается один раз
+    """
+    if archive.lower().endswith(ZIP_SUFFIXES):
+        with zipfile.ZipFile(archive) as zip_file:
+            for info in zip_file.infolist():
+                if not info.filename.endswith('/'):
+                    yield Member(archive, info.filename,
+                                 zip_file.read(info))
+    else:
+        with tarfile.open(archive, 'r|*') as tar:
+            for info in tar:
+                if info.isfile():
+                    yield Member(archive, info.name,
+                                 tar.extractfile(info).read())
+
+
+def expand(paths) -> Iterator[Source]:
+    """
+    Заменяет архивы в списке путей на их содержимое
+    """
+    for path in paths:
+        if is_archive(path):
+            yield from iter_members(path)
+        else:
+            yield path
+
+
+def _archive_stem(path: str) -> str:
+    # Имя архива без расширения архива: project.tar.xz -> project
+    name = ntpath.basename(path)
+    for suffix in sorted(TAR_SUFFIXES + ZIP_SUFFIXES, key=len, reverse=True):
+        if name.lower().endswith(suffix):
+            return name[:-len(suffix)]
+    return name.split('.')[0]
+
+
+def output_stem(source: Source, makedirs: bool = False) -> str:
+    """
+    Путь для выходных файлов без расширения: рядом с исходным файлом,
+    а для файлов из архива - в директории с именем архива рядом с ним,
+    с сохранением директорий внутри архива, чтобы одноименные файлы
+    из разных директорий и архивов не перезаписывали друг друга
+
+    Parameters
+    ----------
+    source: Source
+        Файл на диске или файл из архива
+
+    makedirs: bool
+        Создать директорию для выходных файлов
+
+    Example
+    -------
+    >>> output_stem('/data/1.log')
+    '/data/1'
+    >>> output_stem('/data/project.tar.xz::opt/1.log.gz')
+    '/data/project/opt/1'
+    """
+    archive, name = split_source(source)
+    if name is None:
+        stem = os.path.join(ntpath.dirname(archive),
+                            ntpath.basename(archive).split('.')[0])
+    else:
+        # Абсолютные пути и '..' внутри архива не выводят за его директорию
+        parts = [
+            part for part in name.replace('\\', '/').split('/')
+            if part not in ('', '.', '..')
+        ]
+        parts[-1] = parts[-1].split('.')[0]
+        stem = os.path.join(ntpath.dirname(archive), _archive_stem(archive),
+                            *parts)
+    if makedirs and os.path.dirname(stem):
+        os.makedirs(os.path.dirname(stem), exist_ok=True)
+    return stem
@@ -0,0 +1,253 @@
+from typing import Sequence
+
+import numpy as np
+
+from CosmOrc.reactions import PRECISIONS, R, VIB_CHUNK_SIZE, Compound
+
+
+class CompoundBatch:
+    """
+    Векторизованный расчет энергии Гиббса сразу для многих веществ.
+    Колебательные температуры всех веществ упакованы в один массив
+    (CSR: vib_temp и смещения offsets), остальные параметры - векторы
+    по веществам. Суммы по модам считаются сегментными редукциями
+    (np.add.reduceat), поэтому вместо тысяч мелких вызовов numpy на
+    каждое вещество выполняется несколько больших.
+
+    Формулы те же, что в Compound: G(T, P) = H(T) - T*S(T) + R*T*ln(P)
+
+    Arguments
+    ---------
+    compounds: Sequence[Compound]
+        Вещества проекта
+
+    Attributes
+    ----------
+    names: List[str]
+        Имена веществ
+
+    vib_temp: np.ndarray
+        Колебательные температуры всех веществ подряд
+
+    offsets: np.ndarray
+        Границы веществ в vib_temp, len(offsets) == len(names) + 1
+
+    scf_energy, molecular_mass, linear_coefficient, rotational_entropy,
+    temperature, electronic_entropy: np.ndarray
+        Параметры веществ
+
+    atom: np.ndarray
+        Флаг атома, для атомов колебательные и вращательные вклады равны 0
+
+    chunk_size: int
+        Максимальный размер промежуточного массива моды x температуры
+
+    dtype: np.dtype
+        Точность колебательных сумм и сеток gibbs_relative. В float32
+        энергии считаются относительно scf_energy, отклонение от float64
+        оценивает deviation
+
+    Example
+    -------
+    >>> batch = CompoundBatch(compounds)
+    >>> g = batch.gibbs_array(np.arange(250, 400, 5), np.array([1]))
+    >>> g.shape
+    (len(compounds), 1, 30)
+    """
+
+    __slots__ = ('compounds', 'names', 'vib_temp', 'offsets', 'scf_energy',
+                 'molecular_mass', 'linear_coefficient', 'rotational_entropy',
+                 'temperature', 'electronic_entropy', 'atom', 'chunk_size',
+                 'dtype')
+
+    def __init__(self,
+                 compounds: Sequence[Compound],
+                 chunk_size: int = VIB_CHUNK_SIZE,
+                 dtype: np.dtype = np.float64):
+        self.dtype = np.dtype(dtype)
+        if self.dtype.name not in PRECISIONS:
+            raise ValueError(f'dtype must be one of {PRECISIONS}, '
+                             f'got {self.dtype.name}')
+        self.compounds = list(compounds)
+        self.names = [compound.name for compound in self.compounds]
+        self.chunk_size = chunk_size
+        self.atom = np.array([bool(c.atom) for c in self.compounds])
+        # У атомов мод нет, их колебательные вклады не считаются
+        modes = [
+            np.zeros(0) if c.atom else np.asarray(c.vib_temp, np.float64)
+            for c in self.compounds
+        ]
+        self.vib_temp = (np.concatenate(modes)
+                         if modes else np.zeros(0)).astype(self.dtype)
+        self.offsets = np.cumsum([0] + [len(x) for x in modes])
+
+        def vector(get):
+            return np.array([get(c) for c in self.compounds],
+                            dtype=np.float64)
+
+        self.scf_energy = vector(lambda c: c.qm_data.scf_energy)
+        self.molecular_mass = vector(lambda c: c.qm_data.molecular_mass)
+        self.linear_coefficient = vector(lambda c: c.linear_coefficient)
+        self.rotational_entropy = vector(
+            lambda c: 0 if c.atom else c.qm_data.rotational_entropy)
+        self.temperature = vector(
+            lambda c: 1 if c.atom else c.qm_data.temperature)
+        self.electronic_entropy = vector(
+            lambda c: c.qm_data.get('Electronic Entropy', 0))
+
+    def __len__(self):
+        return len(self.names)
+
+    def _vibrational(self, temperature: np.array):
+        # Колебательные энтальпия и энтропия, массивы вещества x T
+        hv = np.zeros((len(self), len(temperature)), dtype=self.dtype)
+        sv = np.zeros((len(self), len(temperature)), dtype=self.dtype)
+        lengths = np.diff(self.offsets)
+        filled = lengths > 0
+        if not filled.any():
+            return hv, sv
+        # Пустые сегменты пропускаются: сумма непустого сегмента
+        # идет до начала следующего непустого
+        starts = self.offsets[:-1][filled]
+        vib_temp = self.vib_temp[:, None]
+        step = max(1, self.chunk_size // max(len(self.vib_temp), 1))
+        for start in range(0, len(temperature), step):
+            chunk = slice(start, start + step)
+            u = vib_temp / temperature[None, chunk]
+            expm1 = np.expm1(u)
+            hv[filled, chunk] = R * np.add.reduceat(
+                vib_temp / expm1 + 0.5 * vib_temp, starts, axis=0)
+            sv[filled, chunk] = R * np.add.reduceat(
+                u / expm1 - np.log1p(-np.exp(-u)), starts, axis=0)
+        return hv, sv
+
+    def _terms(self, temperature: np.array, relative: bool = True):
+        # H(T) - E0 (H(T) при relative=False) и S(T) при 1 атм
+        # в точности self.dtype, массивы вещества x T
+        hv, sv = self._vibrational(temperature)
+        lc = self.linear_coefficient[:, None]
+        atom = self.atom[:, None]
+        rt = R * temperature[None, :]
+        Ht = 1.5 * rt
+        Hr = np.where(atom, 0, np.where(lc == 1, rt, Ht))
+        enthalpy = Ht + Hr + rt
+        if not relative:
+            enthalpy = enthalpy + self.scf_energy[:, None]
+        enthalpy = enthalpy + hv
+
+        St = R * (1.5 * np.log(self.molecular_mass)[:, None] +
+                  2.5 * np.log(temperature)[None, :]) - 9.69
+        y = np.exp(self.rotational_entropy[:, None] / R -
+                   lc) / self.temperature[:, None]**lc
+        Sr = np.where(atom, 0,
+                      R * (np.log(y * temperature[None, :]**lc) + lc))
+        entropy = St + Sr + sv + self.electronic_entropy[:, None]
+        return (enthalpy.astype(self.dtype, copy=False),
+                entropy.astype(self.dtype, copy=False))
+
+    def thermo_terms(self, temperature: np.array):
+        """
+        Энтальпия H(T) и энтропия S(T) при 1 атм, массивы вещества x T,
+        см. Compound.thermo_terms
+        """
+        temperature = np.atleast_1d(np.asarray(temperature,
+                                               dtype=np.float64))
+        enthalpy, entropy = self._terms(temperature.astype(self.dtype),
+                                        relative=False)
+        return (enthalpy.astype(np.float64, copy=False),
+                entropy.astype(np.float64, copy=False))
+
+    def gibbs_relative(self, temperature: np.array, pressure: np.array):
+        """
+        Энергия Гиббса относительно scf_energy: возвращает вектор
+        scf_energy и массив G - E0 (вещества x давления x температуры)
+        точности self.dtype, см. Compound.gibbs_relative
+        """
+        temperature = np.atleast_1d(np.asarray(temperature,
+                                               dtype=np.float64))
+        pressure = np.atleast_1d(np.asarray(pressure, dtype=np.float64))
+        t = temperature.astype(self.dtype)
+        enthalpy, entropy = self._terms(t)
+        gibbs = (enthalpy - t * entropy)[:, None, :] + np.multiply.outer(
+            R * np.log(pressure), temperature).astype(self.dtype)
+        return self.scf_energy, gibbs
+
+    def gibbs_array(self, temperature: np.array,
+                    pressure: np.array) -> np.array:
+        """
+        Энергия Гиббса всех веществ в float64, массив вещества x давления x
+        температуры
+        """
+        if self.dtype != np.float64:
+            reference, gibbs = self.gibbs_relative(temperature, pressure)
+            return gibbs + reference[:, None, None]
+        temperature = np.atleast_1d(np.asarray(temperature,
+                                               dtype=np.float64))
+        pressure = np.atleast_1d(np.asarray(pressure, dtype=np.float64))
+        enthalpy, entropy = self.thermo_terms(temperature)
+        return ((enthalpy - temperature * entropy)[:, None, :] +
+                np.multiply.outer(R * np.log(pressure), temperature))
+
+    def deviation(self, temperature: np.array, pressure: np.array,
+                  sample: int = 32, seed: int = 0) -> dict:
+        """
+        Максимальное отклонение энергии Гиббса в точности self.dtype
+        от расчета в float64 на случайной выборке из sample веществ.
+        Возвращает словарь: sample - размер выборки, max_abs - отклонение
+        в Дж/моль, compound, temperature, pressure - где оно достигнуто
+        """
+        temperature = np.atleast_1d(np.asarray(temperature,
+                                               dtype=np.float64))
+        pressure = np.atleast_1d(np.asarray(pressure, dtype=np.float64))
+        rng = np.random.RandomState(seed)
+        rows = np.sort(rng.choice(len(self), size=min(sample, len(self)),
+                                  replace=False))
+        report = {'sample': len(rows), 'max_abs': 0.0, 'compound': None,
+                  'temperature': None, 'pressure': None}
+        if not len(rows):
+            return report
+        compounds = [self.compounds[i] for i in rows]
+        exact = CompoundBatch(compounds, chunk_size=self.chunk_size)
+        approx = CompoundBatch(compounds, chunk_size=self.chunk_size,
+                               dtype=self.dtype)
+        # Сравниваются относительные сетки: E0 у обеих одинакова и точна
+        error = np.abs(
+            approx.gibbs_relative(temperature, pressure)[1] -
+            exact.gibbs_relative(temperature, pressure)[1])
+        i, j, k = np.unravel_index(np.argmax(error), error.shape)
+        report.update(max_abs=float(error[i, j, k]),
+                      compound=compounds[i].name,
+                      temperature=float(temperature[k]),
+                      pressure=float(pressure[j]))
+        return report
+
+    def prime(self, temperature: np.array, pressure: np.array) -> int:
+        """
+        Считает G(T, P) одним проходом для веществ, у которых этой
+        сетки еще нет в Compound.grid_cache, и сохраняет результат
+        в их кэши. После этого Reaction не пересчитывает вещества.
+        В float32 сохраняются сетки Compound.gibbs_relative, их
+        используют вещества с precision = 'float32'.
+        Возвращает число посчитанных веществ
+        """
+        temperature = np.atleast_1d(np.asarray(temperature,
+                                               dtype=np.float64))
+        pressure = np.atleast_1d(np.asarray(pressure, dtype=np.float64))
+        key = Compound._gibbs_key(temperature, pressure, self.dtype)
+        missing = [
+            i for i, compound in enumerate(self.compounds)
+            if key not in compound.grid_cache
+        ]
+        if not missing:
+            return 0
+        batch = self if len(missing) == len(self) else CompoundBatch(
+            [self.compounds[i] for i in missing],
+            chunk_size=self.chunk_size,
+            dtype=self.dtype)
+        if self.dtype == np.float64:
+            gibbs = batch.gibbs_array(temperature, pressure)
+        else:
+            gibbs = batch.gibbs_relative(temperature, pressure)[1]
+        for i, g in zip(missing, gibbs):
+            self.compounds[i].grid_cache.put(key, g.copy())
+        return len(missing)
@@ -0,0 +1,386 @@
+import hashlib
+import json
+import os
+import sqlite3
+from functools import partial
+from multiprocessing.util import Finalize
+from typing import Any, Dict, Iterable, Optional
+
+import CosmOrc.archive as archive
+import CosmOrc.gauspar as gauspar
+import CosmOrc.orpar as orpar
+from CosmOrc.record import ThermoRecord
+
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'CosmOrc')
+CACHE_FILE = 'parse_cache.sqlite'
+
+# Версия парсеров gauspar и orpar. Увеличивается при каждом изменении,
+# которое меняет результат разбора: записи другой версии не используются
+PARSER_VERSION = 2
+
+# Через сколько обращений счетчики попаданий и промахов записываются
+# в базу, остаток записывается при выходе из процесса
+STATS_FLUSH_EVERY = 100
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS thermo_records (
+    path TEXT NOT NULL,
+    program TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest TEXT,
+    record TEXT NOT NULL,
+    parser_version INTEGER NOT NULL,
+    PRIMARY KEY (path, program)
+);
+CREATE TABLE IF NOT EXISTS cache_stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+'''
+
+
+def file_digest(file_path: str, chunk_size: int = 1 << 20) -> str:
+    """
+    Возвращает sha1 содержимого файла, файл читается блоками
+    """
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as data_file:
+        for chunk in iter(lambda: data_file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_key(file_path: archive.Source) -> str:
+    """
+    Ключ файла в кэше и в таблицах команды parsing: абсолютный путь,
+    для файла из архива - абсолютный путь к архиву и путь внутри него
+    """
+    path, member = archive.split_source(file_path)
+    key = os.path.abspath(path)
+    if member is not None:
+        key += archive.MEMBER_SEPARATOR + member
+    return key
+
+
+def select_parser(qm_program: str, tail: bool = False, step: int = None):
+    """
+    Возвращает ключ кэша и функцию парсинга для указанной программы
+    """
+    program = qm_program.lower()
+    if program == 'gaussian':
+        key = program
+        if tail:
+            key += ':tail'
+        if step is not None:
+            key += f':step={step}'
+        return key, partial(gauspar.file_pars, tail=tail, step=step)
+    elif program == 'orca':
+        return program, orpar.file_pars
+    else:
+        raise ValueError(f'{qm_program} does not supported')
+
+
+class ParseCache:
+    """
+    Постоянный кэш результатов file_pars на диске (SQLite).
+    Запись считается актуальной, пока у файла не изменились размер и
+    время модификации, а при hash_content=True ещё и sha1 содержимого,
+    и пока не изменилась версия парсеров PARSER_VERSION.
+
+    Arguments
+    ---------
+    path: str
+        Путь к файлу базы данных (default: CACHE_DIR/CACHE_FILE)
+
+    hash_content: bool
+        Дополнительно сверять sha1 содержимого файла
+
+    Attributes
+    ----------
+    hits: int
+        Число обращений этого процесса, для которых запись нашлась в кэше
+
+    misses: int
+        Число обращений этого процесса, потребовавших повторного парсинга.
+        Общие для всех процессов счетчики хранятся в базе, см. stats
+
+    Example
+    -------
+    >>> cache = ParseCache('/tmp/cache.sqlite')
+    >>> series = cache.file_pars('/some/path/1.log', qm_program='gaussian')
+    >>> cache.stats()
+    {'entries': 1, 'hits': 0, 'misses': 1, 'size': 12288}
+    """
+
+    __slots__ = ('path', 'hash_content', 'hits', 'misses', '_connection',
+                 '_pid', '_pending')
+
+    def __init__(self, path: str = None, hash_content: bool = False):
+        if path is None:
+            path = os.path.join(CACHE_DIR, CACHE_FILE)
+        self.path = path
+        self.hash_content = hash_content
+        self.hits = 0
+        self.misses = 0
+        self._connection = None
+        self._pid = None
+        # Еще не записанные в базу попадания и промахи
+        self._pending = {'hits': 0, 'misses': 0}
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        # Соединение нельзя разделять между процессами,
+        # поэтому после fork открываем новое
+        if self._connection is None or self._pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=60)
+            columns = [
+                row[1] for row in connection.execute(
+                    'PRAGMA table_info(thermo_records)')
+            ]
+            if columns and 'parser_version' not in columns:
+                # База старого формата: версия парсеров записей неизвестна
+                with connection:
+                    connection.execute('DROP TABLE thermo_records')
+            connection.executescript(_SCHEMA)
+            if self._pid != os.getpid():
+                # Счетчики родительского процесса уже учтены им самим.
+                # Остаток счетчиков записывается при выходе из процесса,
+                # в том числе из процесса пула (atexit там не вызывается)
+                self._pending = {'hits': 0, 'misses': 0}
+                Finalize(None, self._flush_stats, exitpriority=0)
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
+
+    def _count(self, name: str):
+        # Учет попадания или промаха, в базу пишется пачками
+        setattr(self, name, getattr(self, name) + 1)
+        self._pending[name] += 1
+        if sum(self._pending.values()) >= STATS_FLUSH_EVERY:
+            self._flush_stats()
+
+    def _write_stats(self):
+        # Добавляет накопленные счетчики в базу в текущей транзакции
+        for name, value in self._pending.items():
+            self.connection.execute(
+                'INSERT OR IGNORE INTO cache_stats VALUES (?, 0)', (name, ))
+            self.connection.execute(
+                'UPDATE cache_stats SET value = value + ? WHERE name = ?',
+                (value, name))
+        self._pending = {'hits': 0, 'misses': 0}
+
+    def _flush_stats(self):
+        if not any(self._pending.values()) or self._pid != os.getpid():
+            return
+        try:
+            with self.connection:
+                self._write_stats()
+        except sqlite3.Error:
+            pass
+
+    @staticmethod
+    def _key(file_path: archive.Source) -> str:
+        return source_key(file_path)
+
+    def _identity(self, file_path: archive.Source) -> Dict[str, Any]:
+        # Для файла из архива размер, время и хэш берутся у самого архива
+        path, _ = archive.split_source(file_path)
+        stat = os.stat(path)
+        return {
+            'path': self._key(file_path),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'digest': file_digest(path) if self.hash_content else None
+        }
+
+    def get(self, file_path: str,
+            qm_program: str) -> Optional[ThermoRecord]:
+        """
+        Возвращает сохраненную запись или None,
+        если записи нет или файл изменился
+        """
+        identity = self._identity(file_path)
+        row = self.connection.execute(
+            'SELECT size, mtime_ns, digest, record, parser_version '
+            'FROM thermo_records WHERE path = ? AND program = ?',
+            (identity['path'], qm_program)).fetchone()
+        if row is None:
+            self._count('misses')
+            return None
+        size, mtime_ns, digest, record, parser_version = row
+        if (size != identity['size'] or mtime_ns != identity['mtime_ns']
+                or parser_version != PARSER_VERSION
+                or (self.hash_content and digest != identity['digest'])):
+            self._count('misses')
+            return None
+        self._count('hits')
+        return ThermoRecord.from_dict(json.loads(record))
+
+    def put(self, file_path: str, qm_program: str, record: ThermoRecord):
+        """
+        Сохраняет запись, полученную из file_pars, в кэш
+        """
+        identity = self._identity(file_path)
+        record = json.dumps(record.to_dict())
+        with self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO thermo_records '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (identity['path'], qm_program, identity['size'],
+                 identity['mtime_ns'], identity['digest'], record,
+                 PARSER_VERSION))
+            self._write_stats()
+
+    def records(self,
+                paths: Iterable[str] = None,
+                qm_program: str = None) -> Dict[str, ThermoRecord]:
+        """
+        Сохраненные записи по абсолютным путям к файлам без проверки
+        самих файлов: файлы могут быть недоступны, устаревшие записи
+        тоже возвращаются. По умолчанию - все записи
+
+        Parameters
+        ----------
+        paths: Iterable[str]
+            Пути к файлам, отсутствующие в кэше пропускаются
+
+        qm_program: str
+            Программа, 'gaussian' или 'orca'. Подходят и записи с другими
+            опциями парсера (ключи 'gaussian:tail', 'gaussian:step=2',
+            см. select_parser), при нескольких записях одного файла
+            предпочитается запись без опций
+        """
+        query = 'SELECT path, program, record FROM thermo_records'
+        rows = self.connection.execute(query)
+        if paths is not None:
+            keys = {self._key(path) for path in paths}
+        records = {}
+        for path, program, record in rows:
+            if paths is not None and path not in keys:
+                continue
+            if (qm_program is not None
+                    and program.split(':')[0] != qm_program.lower()):
+                continue
+            if path in records and ':' in program:
+                continue
+            records[path] = ThermoRecord.from_dict(json.loads(record))
+        return records
+
+    def file_pars(self,
+                  file_path: str,
+                  qm_program: str = 'gaussian',
+                  tail: bool = False,
+                  step: int = None) -> ThermoRecord:
+        """
+        Аналог gauspar.file_pars и orpar.file_pars, при наличии
+        актуальной записи файл не перечитывается
+
+        Parameters
+        ----------
+        file_path: str
+            Путь к выходному файлу программы
+
+        qm_program: str
+            'gaussian' или 'orca'
+
+        tail: bool
+            Читать Gaussian с конца файла, см. gauspar.read_data_gaussian_tail
+
+        step: int
+            Номер шага --Link1-- Gaussian, см. gauspar.select_link_step
+        """
+        key, parser = select_parser(qm_program, tail=tail, step=step)
+        record = self.get(file_path, key)
+        if record is None:
+            record = parser(file_path)
+            self.put(file_path, key, record)
+        return record
+
+    def invalidate(self, file_path: str = None) -> int:
+        """
+        Удаляет записи для файла, или все записи и счетчики, если
+        file_path не указан. Возвращает число удаленных записей
+        """
+        with self.connection:
+            if file_path is None:
+                self._pending = {'hits': 0, 'misses': 0}
+                self.connection.execute('DELETE FROM cache_stats')
+                cursor = self.connection.execute('DELETE FROM thermo_records')
+            else:
+                cursor = self.connection.execute(
+                    'DELETE FROM thermo_records WHERE path = ?',
+                    (self._key(file_path), ))
+        return cursor.rowcount
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Число записей, попаданий и промахов всех процессов, работавших
+        с базой, а также размер базы в байтах
+        """
+        self._flush_stats()
+        entries = self.connection.execute(
+            'SELECT COUNT(*) FROM thermo_records').fetchone()[0]
+        counters = dict(
+            self.connection.execute('SELECT name, value FROM cache_stats'))
+        return {
+            'entries': entries,
+            'hits': counters.get('hits', 0),
+            'misses': counters.get('misses', 0),
+            'size': os.path.getsize(self.path)
+        }
+
+
+_default_cache: Optional[ParseCache] = None
+
+
+def default_cache() -> Optional[ParseCache]:
+    """
+    Общий для процесса кэш. Расположение задается переменной окружения
+    COSMORC_CACHE_DIR, переменная COSMORC_NO_CACHE отключает кэш
+    """
+    global _default_cache
+    if os.environ.get('COSMORC_NO_CACHE'):
+        return None
+    if _default_cache is None:
+        directory = os.environ.get('COSMORC_CACHE_DIR', CACHE_DIR)
+        _default_cache = ParseCache(os.path.join(directory, CACHE_FILE))
+    return _default_cache
+
+
+def file_pars(file_path: str,
+              qm_program: str = 'gaussian',
+              tail: bool = False,
+              step: int = None,
+              use_cache: bool = True) -> ThermoRecord:
+    """
+    Парсит файл через общий кэш. Если кэш недоступен (нет прав на
+    запись, поврежденная база), файл парсится напрямую, а запись,
+    которую не удалось сохранить в кэш, все равно возвращается.
+    Ошибки чтения самого файла и ошибки парсера не перехватываются
+    """
+    key, parser = select_parser(qm_program, tail=tail, step=step)
+    cache = default_cache() if use_cache else None
+    if cache is not None:
+        try:
+            cache.connection
+        except (sqlite3.Error, OSError):
+            cache = None
+    record = None
+    if cache is not None:
+        # OSError здесь - ошибка stat самого файла, см. ParseCache._identity
+        try:
+            record = cache.get(file_path, key)
+        except sqlite3.Error:
+            cache = None
+    if record is None:
+        record = parser(file_path)
+        if cache is not None:
+            try:
+                cache.put(file_path, key, record)
+            except (sqlite3.Error, OSError):
+                pass
+    return record
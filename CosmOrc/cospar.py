@@ -1,7 +1,15 @@
+import os
 import re
+import tempfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+from typing import Dict, Iterator, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 
+import CosmOrc.archive as archive
 from CosmOrc.setting import Setting
 
 
@@ -56,19 +64,73 @@ def read_data_cosmo(file_path: str = None) -> list:
         в каждый подмассив массива, входят данные о каждой конкретной работы
     """
 
-    with open(file_path, "r") as file:
-        data = []
-        for line in file:
-            if line.split():
-                # Выбираем строки с параметрами расчета
-                if "Setting" in line:
-                    jobs_data = []
-                    jobs_data.append(line)
-                    data.append(jobs_data)
-                # Выбираем строки с единицами измерения и данными расчетов
-                elif "job" not in line or "Units" in line:
-                    jobs_data.append(line)
-    return data
+    with archive.open_text(file_path) as file:
+        return list(group_jobs(file))
+
+
+def iter_jobs(file_path: str = None) -> Iterator[list]:
+    """Потоковый аналог read_data_cosmo: возвращает работы по одной,
+    в памяти хранится только текущая работа
+    """
+    with archive.open_text(file_path) as file:
+        yield from group_jobs(file)
+
+
+def group_jobs(lines) -> Iterator[list]:
+    """Разбивает строки *.tab файла на работы, см. read_data_cosmo
+    """
+    jobs_data = None
+    for line in lines:
+        if line.split():
+            # Выбираем строки с параметрами расчета
+            if "Setting" in line:
+                if jobs_data is not None:
+                    yield jobs_data
+                jobs_data = []
+                jobs_data.append(line)
+            # Выбираем строки с единицами измерения и данными расчетов
+            elif "job" not in line or "Units" in line:
+                jobs_data.append(line)
+    if jobs_data is not None:
+        yield jobs_data
+
+
+def split_jobs(file_path: str, chunks: int) -> List[Tuple[int, int]]:
+    """Делит *.tab файл на chunks примерно равных по размеру кусков,
+    каждый кусок начинается со строки 'Settings'. Файл не читается
+    целиком: для каждой границы ищется ближайшая следующая работа
+
+    Return
+    ------
+    ranges: List[Tuple[int, int]]
+        Пары (начало, конец) в байтах, без пустых кусков
+    """
+    size = os.path.getsize(file_path)
+    starts = [0]
+    with open(file_path, 'rb') as data_file:
+        for i in range(1, chunks):
+            data_file.seek(max(i * size // chunks, starts[-1]))
+            # Пропускаем недочитанную строку
+            data_file.readline()
+            pos = data_file.tell()
+            for line in iter(data_file.readline, b''):
+                if b"Setting" in line:
+                    break
+                pos += len(line)
+            else:
+                break
+            if pos > starts[-1]:
+                starts.append(pos)
+    return list(zip(starts, starts[1:] + [size]))
+
+
+def read_jobs_chunk(file_path: str, start: int, stop: int) -> list:
+    """Разбирает работы из куска файла [start, stop), см. split_jobs
+    """
+    with open(file_path, 'rb') as data_file:
+        data_file.seek(start)
+        text = data_file.read(stop - start).decode('utf-8', errors='replace')
+    return [Job(job) for job in group_jobs(text.splitlines(True))]
 
 
 def compound_nr(some_str: str):
@@ -126,6 +188,39 @@ def setting_pars(settings_str: str):
     return int(job_indx), tuple(settings_list)
 
 
+_COMPOUND_NR = re.compile(r"x\(([\d]*)\)=")
+
+
+def settings_values(settings_str: str):
+    """Быстрый аналог setting_pars: разбирает строку 'Settings' в словари
+    значений и единиц измерения, без объектов Setting. Доли веществ
+    x(n)= получают имя 'n' и единицы '%', у остальных настроек без
+    единиц измерения (например 'p= 1.0') единицы None
+
+    Example
+    -------
+    >>> settings_values('Settings  job 2 : T= 223.15 K ; x(1)= 0.1 x(2)= 0.9;')
+    (2, {'T=': 223.15, '1': 0.1, '2': 0.9}, {'T=': 'K', '1': '%', '2': '%'})
+    """
+    job_indx, new_line = settings_str.split(":", 1)
+    values = {}
+    units = {}
+    for setting in new_line.split(";"):
+        tokens = setting.split()
+        if len(tokens) == 3:
+            name, value, unit = tokens
+            values[name] = float(value)
+            units[name] = unit
+        elif len(tokens) >= 2:
+            for name, value in zip(tokens[::2], tokens[1::2]):
+                nr = _COMPOUND_NR.match(name)
+                if nr:
+                    name = nr.group(1)
+                values[name] = float(value)
+                units[name] = "%" if nr else None
+    return int(job_indx.split()[2]), values, units
+
+
 def columns_pars(head_str: str):
     """Функция для парсинга строки заголовка таблицы,
     возвращает массив с названиями всех столбцов
@@ -184,6 +279,47 @@ def data_pars(data: list or tuple):
     return compounds, new_parameters
 
 
+def table_pars(data: list or tuple, ncolumns: int):
+    """Функция для парсинга данных одной таблицы целиком, без разбора
+    каждой строки по отдельности. Значения 'NA' сразу становятся NaN
+
+    Arguments
+    ---------
+    data: list or tuple
+        Список содержащий строки с данными расчета CosmoTherm
+
+    ncolumns: int
+        Число числовых колонок таблицы, см. columns_pars
+
+    Return
+    ------
+    compounds: list
+        Имена веществ
+
+    values: np.ndarray
+        Массив float64 размером (len(data), ncolumns)
+
+    Example
+    -------
+    >>> compounds, values = table_pars(['1 dbunew 7.9345E-10 NA',
+    ...                                 '2 cosmo1 3.0623E-36 -5.3417'], 3)
+    >>> compounds
+    ['dbunew', 'cosmo1']
+    >>> values
+    array([[ 1.0000e+00,  7.9345e-10,         nan],
+           [ 2.0000e+00,  3.0623e-36, -5.3417e+00]])
+    """
+    tokens = ' '.join(data).split()
+    if len(tokens) != len(data) * (ncolumns + 1):
+        raise ValueError(f'table rows must have {ncolumns + 1} fields')
+    compounds = tokens[1::ncolumns + 1]
+    del tokens[1::ncolumns + 1]
+    # numpy разбирает строки в float сам, 'NA' заменяется на 'nan'
+    values = np.array([x if x != 'NA' else 'nan' for x in tokens],
+                      dtype=np.float64)
+    return compounds, values.reshape(len(data), ncolumns)
+
+
 class Job:
     """
     Arguments
@@ -193,14 +329,20 @@ class Job:
 
     Attributes
     ---------
-    setting:
-        Набор настроек данного расчета
+    setting_values: Dict[str, float]
+        Значения настроек данного расчета, см. settings_values
+
+    setting_units: Dict[str, str]
+        Единицы измерения настроек
+
+    settings: List[Setting]
+        Настройки в виде объектов Setting, создаются при обращении
 
     units:
         Строка с информацией о некоторых единицах измерения
 
-    parameters:
-        Данные расчетов СosmoTherm
+    parameters: np.ndarray
+        Данные расчетов СosmoTherm, float64, отсутствующие значения - NaN
 
     Properties
     ----------
@@ -212,15 +354,23 @@ class Job:
 
     """
 
-    __slots__ = ("units", "settings", "compounds", "parameters", "columns",
-                 "job_indx")
+    __slots__ = ("units", "setting_values", "setting_units", "compounds",
+                 "parameters", "columns", "job_indx")
 
     def __init__(self, job: list or tuple):
         self.units = job[1]
-        self.job_indx, self.settings = setting_pars(job[0])
-        self.compounds, self.parameters = data_pars(job[3:])
+        (self.job_indx, self.setting_values,
+         self.setting_units) = settings_values(job[0])
         self.columns = columns_pars(job[2])
-        self.settings = list(self.settings)
+        self.compounds, self.parameters = table_pars(job[3:],
+                                                     len(self.columns))
+
+    @property
+    def settings(self) -> List[Setting]:
+        return [
+            Setting(name=name, value=value, unit=self.setting_units[name])
+            for name, value in self.setting_values.items()
+        ]
 
     def full_df(self):
         """
@@ -234,12 +384,11 @@ class Job:
                 index -- мультииндекс состоящий из номера работы и списка
                 рассчитываемых веществ.
                 columns -- названия параметров,
-                data -- значения таблицы COSMOtherm
+                data -- значения таблицы COSMOtherm, NaN вместо 'NA'
         """
-        index = list(zip([self.job_indx] * len(self.compounds),
-                         self.compounds))
-        multiindex = pd.MultiIndex.from_tuples(index,
-                                               names=["Job", "Compound"])
+        multiindex = pd.MultiIndex.from_arrays(
+            [[self.job_indx] * len(self.compounds), self.compounds],
+            names=["Job", "Compound"])
         return pd.DataFrame(data=self.parameters,
                             index=multiindex,
                             columns=self.columns)
@@ -262,22 +411,114 @@ class Job:
         """
         """
         columns = [self.job_indx]
-        index = [x.name for x in self.settings]
+        settings = self.settings
+        index = [x.name for x in settings]
 
-        if 'p=' in index:
-            pass
-        else:
+        if 'p=' not in index:
             index.append('p=')
-            self.settings.append(Setting(name='p=', value=1, unit='atm'))
+            settings.append(Setting(name='p=', value=1, unit='atm'))
 
         if detailed:
-            data = self.settings
+            data = settings
         else:
-            data = [x.value for x in self.settings]
+            data = [x.value for x in settings]
 
         return pd.DataFrame(columns=columns, index=index, data=data)
 
 
+class SettingsTable:
+    """
+    Настройки всех работ *.tab файла в виде одной числовой матрицы
+    работа x настройка: T=, p= и доли веществ по номеру Nr. Единицы
+    измерения хранятся один раз на колонку (берутся из первой работы,
+    где встречается настройка). Отсутствующие значения - NaN, кроме p=,
+    для которого, как и в Job.settings_df, подставляется 1 atm.
+
+    Attributes
+    ----------
+    jobs: np.ndarray
+        Номера работ
+
+    names: Tuple[str]
+        Имена настроек (колонки матрицы)
+
+    units: Tuple[str]
+        Единицы измерения колонок
+
+    values: np.ndarray
+        Матрица float64 размером (len(jobs), len(names)), только для чтения
+    """
+
+    __slots__ = ('jobs', 'names', 'units', 'values')
+
+    def __init__(self, jobs, names, units, values):
+        self.jobs = np.asarray(jobs, dtype=np.int64)
+        self.names = tuple(names)
+        self.units = tuple(units)
+        self.values = np.asarray(values, dtype=np.float64)
+        self.values.flags.writeable = False
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        Строит таблицу за один проход по тройкам
+        (номер работы, значения, единицы), см. settings_values
+        """
+        jobs = []
+        rows = []
+        units = {}
+        for job_indx, values, job_units in records:
+            jobs.append(job_indx)
+            rows.append(values)
+            for name, unit in job_units.items():
+                units.setdefault(name, unit)
+        units.setdefault('p=', 'atm')
+        names = list(units)
+        position = {name: i for i, name in enumerate(names)}
+        matrix = np.full((len(rows), len(names)), np.nan)
+        for i, values in enumerate(rows):
+            matrix[i, [position[name] for name in values]] = list(
+                values.values())
+        p = matrix[:, position['p=']]
+        p[np.isnan(p)] = 1
+        return cls(jobs, names, [units[name] for name in names], matrix)
+
+    @classmethod
+    def from_jobs(cls, jobs: List[Job]):
+        return cls.from_records(
+            (job.job_indx, job.setting_values, job.setting_units)
+            for job in jobs)
+
+    def column(self, name: str) -> np.ndarray:
+        """
+        Значения настройки по работам, NaN для работ без неё
+        """
+        if name not in self.names:
+            return np.full(len(self.jobs), np.nan)
+        return self.values[:, self.names.index(name)]
+
+    def frame(self) -> pd.DataFrame:
+        """
+        Таблица работа x настройка, индекс - номер работы
+        """
+        return pd.DataFrame(self.values.copy(),
+                            index=pd.Index(self.jobs, name='Job'),
+                            columns=list(self.names))
+
+    def settings_df(self) -> pd.DataFrame:
+        """
+        Таблица в виде Jobs.settings_df(): строки - настройки,
+        колонки - работы, отсутствующие значения - 0
+        """
+        return pd.DataFrame(self.values.T,
+                            index=list(self.names),
+                            columns=self.jobs.tolist()).sort_index().fillna(0)
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes + self.jobs.nbytes
+
+
 class Jobs:
     """
     Класс, хранит в себе данные одного расчета COSMOTherm.
@@ -290,6 +531,12 @@ class Jobs:
         path: str
             Путь к *.tab файлу
 
+        workers: int
+            Число процессов для разбора файла (default: 1), 0 - по одному
+            на процессор. Файл делится на куски по границам работ, см.
+            split_jobs; сжатые файлы и файлы из архивов разбираются в
+            одном процессе
+
     Methods
     -------
     full_df(csv: bool, invert: bool): df
@@ -301,18 +548,66 @@ class Jobs:
 
     __slots__ = ("path", "data")
 
-    def __init__(self, path: str):
+    def __init__(self, path: str, workers: int = 1):
         self.path = path
-        self.data = [Job(i) for i in read_data_cosmo(path)]
+        if workers != 1 and archive.is_plain_file(path):
+            workers = workers or os.cpu_count() or 1
+            # Кусков больше, чем процессов, чтобы выровнять нагрузку
+            chunks = split_jobs(path, 4 * workers)
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                self.data = list(
+                    chain.from_iterable(
+                        executor.map(read_jobs_chunk, [path] * len(chunks),
+                                     *zip(*chunks))))
+        else:
+            self.data = [Job(i) for i in read_data_cosmo(path)]
+
+    @classmethod
+    def from_jobs(cls, path: str, jobs: List[Job]):
+        """
+        Создает Jobs из уже разобранных работ, файл не читается
+        """
+        new = cls.__new__(cls)
+        new.path = path
+        new.data = list(jobs)
+        return new
 
     def full_df(self, invert=None):
-        # TODO Документация
         """
+        Таблица всех работ: индекс (Job, Compound), колонки - объединение
+        колонок всех работ в алфавитном порядке. Отсутствующие значения
+        заменяются на 0, колонки из целых чисел (Nr) имеют тип int64
+
+        Arguments
+        ---------
+        invert: bool
+            Поменять уровни индекса местами: (Compound, Job)
         """
-        df = pd.concat([job.full_df() for job in self.data], sort=True)
-        df = df.applymap(lambda x: 0 if x == 'NA' else x)
-        df = df.apply(pd.to_numeric)
-        df.fillna(0, inplace=True)
+        columns = sorted(set().union(*(job.columns for job in self.data)))
+        position = {column: i for i, column in enumerate(columns)}
+        nrows = sum(len(job.compounds) for job in self.data)
+        values = np.full((nrows, len(columns)), np.nan)
+        start = 0
+        for job in self.data:
+            stop = start + len(job.compounds)
+            values[start:stop, [position[x] for x in job.columns]] = \
+                job.parameters
+            start = stop
+        values[np.isnan(values)] = 0
+        index = pd.MultiIndex.from_arrays([
+            np.repeat([job.job_indx for job in self.data],
+                      [len(job.compounds) for job in self.data]),
+            list(chain.from_iterable(job.compounds for job in self.data))
+        ],
+                                          names=["Job", "Compound"])
+        integer = (values == np.trunc(values)).all(axis=0)
+        df = pd.DataFrame(
+            {
+                column: values[:, i].astype(np.int64) if integer[i] else
+                values[:, i]
+                for i, column in enumerate(columns)
+            },
+            index=index)
         if invert:
             df.sort_index(axis=0, level=1, inplace=True)
             return df.swaplevel(i=-2, j=-1, axis=0)
@@ -349,11 +644,527 @@ class Jobs:
             df.fillna(0, inplace=True)
             return df
         else:
-            df = pd.concat([job.settings_df() for job in self.data],
-                           axis=1,
-                           sort=True)
-            df.fillna(0, inplace=True)
-            return df
+            return self.settings_table().settings_df()
+
+    def settings_table(self):
+        """
+        Настройки всех работ в виде числовой матрицы, см. SettingsTable
+        """
+        return SettingsTable.from_jobs(self.data)
+
+
+class CompoundIndex:
+    """
+    Индекс результатов COSMOtherm по веществам: номер Nr и непрерывные
+    массивы Gsolv и ln(gamma) по работам. Позволяет получать данные
+    вещества индексированием массивов вместо поиска по MultiIndex.
+
+    Arguments
+    ---------
+    full: pd.DataFrame
+        Таблица Jobs.full_df() с колонками Gsolv, ln(gamma) и Nr
+
+    Attributes
+    ----------
+    jobs: np.ndarray
+        Номера работ по возрастанию, общая ось всех массивов
+
+    compounds: Tuple[str]
+        Имена веществ
+
+    nr: np.ndarray
+        Номер вещества в первой работе, где оно встречается
+
+    gsolv: np.ndarray
+        Gsolv, массив (len(compounds), len(jobs)), NaN если вещества
+        нет в работе
+
+    lngamma: np.ndarray
+        ln(gamma), как gsolv
+
+    Example
+    -------
+    >>> index = CompoundIndex(Jobs('1.tab').full_df())
+    >>> row = index.row('cosmo1')
+    >>> index.nr[row], index.gsolv[row]
+    """
+
+    __slots__ = ('jobs', 'compounds', 'nr', 'gsolv', 'lngamma', '_rows')
+
+    def __init__(self, full: pd.DataFrame):
+        job_codes, jobs = pd.factorize(full.index.get_level_values('Job'),
+                                       sort=True)
+        compound_codes, compounds = pd.factorize(
+            full.index.get_level_values('Compound'), sort=True)
+        self.jobs = np.asarray(jobs, dtype=np.int64)
+        self.compounds = tuple(compounds)
+        self._rows = {name: i for i, name in enumerate(self.compounds)}
+        shape = (len(self.compounds), len(self.jobs))
+
+        def matrix(column):
+            values = np.full(shape, np.nan)
+            values[compound_codes, job_codes] = full[column].to_numpy(
+                dtype=np.float64)
+            return values
+
+        self.gsolv = matrix('Gsolv')
+        self.lngamma = matrix('ln(gamma)')
+        nr = matrix('Nr')
+        first = np.argmax(~np.isnan(nr), axis=1)
+        self.nr = nr[np.arange(len(self.compounds)), first].astype(np.int64)
+
+    def __contains__(self, compound: str) -> bool:
+        return compound in self._rows
+
+    def row(self, compound: str) -> int:
+        """
+        Номер строки вещества в массивах, KeyError если вещества нет
+        """
+        return self._rows[compound]
+
+    @property
+    def nbytes(self) -> int:
+        return (self.jobs.nbytes + self.nr.nbytes + self.gsolv.nbytes +
+                self.lngamma.nbytes)
+
+
+class JobIndex:
+    """
+    Ленивый доступ к работам *.tab файла. При создании файл читается
+    один раз и запоминаются только смещения начала каждой работы
+    и строки 'Settings', сами таблицы разбираются по запросу.
+    Индексы и срезы - порядковые номера работ в файле, начиная с 0.
+
+    Arguments
+    ---------
+    path: str
+        Путь к *.tab файлу
+
+    Attributes
+    ----------
+    offsets: np.ndarray
+        Смещения (в байтах) начала каждой работы и конец файла
+
+    settings_lines: List[str]
+        Строки 'Settings' каждой работы
+
+    Example
+    -------
+    >>> index = JobIndex('1.tab')
+    >>> len(index)
+    5000
+    >>> index[120:140].small_df(columns=('Gsolv', 'Nr'))
+    >>> index.where('T=', 298.15).settings_df()
+    """
+
+    __slots__ = ('path', 'offsets', 'settings_lines')
+
+    def __init__(self, path: str):
+        self.path = path
+        offsets = []
+        self.settings_lines = []
+        pos = 0
+        with archive.open_binary(path) as data_file:
+            for line in data_file:
+                if b"Setting" in line:
+                    offsets.append(pos)
+                    self.settings_lines.append(
+                        line.decode('utf-8', errors='replace'))
+                pos += len(line)
+        offsets.append(pos)
+        self.offsets = np.array(offsets, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.settings_lines)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return Jobs.from_jobs(self.path,
+                                  self._read(range(len(self))[item]))
+        return self._read([range(len(self))[item]])[0]
+
+    def _read(self, positions) -> List[Job]:
+        jobs = []
+        with archive.open_binary(self.path) as data_file:
+            for position in positions:
+                start, stop = self.offsets[position:position + 2]
+                data_file.seek(start)
+                text = data_file.read(stop - start).decode('utf-8',
+                                                           errors='replace')
+                jobs.extend(
+                    Job(job) for job in group_jobs(text.splitlines(True)))
+        return jobs
+
+    def settings(self, position: int) -> Tuple[Setting]:
+        """
+        Настройки работы, файл не читается
+        """
+        _, values, units = settings_values(self.settings_lines[position])
+        return tuple(
+            Setting(name=name, value=value, unit=units[name])
+            for name, value in values.items())
+
+    def where(self, name: str, value: float, tolerance: float = 1e-6) -> Jobs:
+        """
+        Работы, у которых значение настройки name совпадает с value
+
+        Arguments
+        ---------
+        name: str
+            Имя настройки, например 'T=' или номер вещества '1' для x(1)
+
+        value: float
+            Искомое значение
+
+        tolerance: float
+            Допустимое абсолютное отклонение
+        """
+        positions = []
+        for position, line in enumerate(self.settings_lines):
+            setting = settings_values(line)[1].get(name)
+            if setting is not None and abs(setting - value) <= tolerance:
+                positions.append(position)
+        return Jobs.from_jobs(self.path, self._read(positions))
+
+
+# Ограничение памяти реестра по умолчанию, байт
+REGISTRY_MAX_BYTES = 512 * 2**20
+
+
+class JobsRegistry:
+    """
+    Общий для процесса реестр разобранных *.tab файлов. Каждый файл
+    парсится один раз, пока у него не изменились время модификации и
+    размер; таблицы данных и настроек выдаются копиями. При превышении
+    max_bytes удаляются давно не использованные файлы.
+
+    Arguments
+    ---------
+    max_bytes: int
+        Ограничение суммарного размера таблиц в памяти, байт
+
+    workers: int
+        Число процессов для разбора одного файла, см. Jobs
+
+    Attributes
+    ----------
+    hits: int
+        Число обращений к уже разобранному файлу
+
+    misses: int
+        Число разборов файлов
+
+    Example
+    -------
+    >>> registry = JobsRegistry()
+    >>> data = registry.small_df('1.tab', columns=('Gsolv', 'Nr'), invert=1)
+    >>> settings = registry.settings_df('1.tab')
+    >>> registry.stats()['misses']
+    1
+    """
+
+    __slots__ = ('max_bytes', 'workers', 'hits', 'misses', '_entries',
+                 '_size')
+
+    def __init__(self, max_bytes: int = REGISTRY_MAX_BYTES, workers: int = 1):
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self.hits = 0
+        self.misses = 0
+        # ключ -> [mtime_ns, size, full_df, SettingsTable, CompoundIndex, байт]
+        self._entries = OrderedDict()
+        self._size = 0
+
+    @staticmethod
+    def _identity(path: archive.Source):
+        # Для файла из архива время и размер берутся у самого архива
+        file_path, member = archive.split_source(path)
+        stat = os.stat(file_path)
+        key = os.path.abspath(file_path)
+        if member is not None:
+            key += archive.MEMBER_SEPARATOR + member
+        return key, stat.st_mtime_ns, stat.st_size
+
+    def _entry(self, path: archive.Source) -> list:
+        key, mtime_ns, size = self._identity(path)
+        entry = self._entries.get(key)
+        if entry is not None and entry[:2] == [mtime_ns, size]:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry
+        if entry is not None:
+            self._drop(key)
+        self.misses += 1
+        jobs = Jobs(path, workers=self.workers)
+        full = jobs.full_df()
+        settings = jobs.settings_table()
+        nbytes = int(full.memory_usage(deep=True).sum() + settings.nbytes)
+        entry = [mtime_ns, size, full, settings, None, nbytes]
+        self._entries[key] = entry
+        self._size += nbytes
+        self._evict()
+        return entry
+
+    def _tables(self, path: archive.Source):
+        return self._entry(path)[2:4]
+
+    def _evict(self):
+        # Последний разобранный файл остается, даже если он больше лимита
+        while self._size > self.max_bytes and len(self._entries) > 1:
+            self._drop(next(iter(self._entries)))
+
+    def _drop(self, key: str):
+        self._size -= self._entries.pop(key)[-1]
+
+    def full_df(self, path: archive.Source, invert=None) -> pd.DataFrame:
+        """
+        Аналог Jobs(path).full_df(invert)
+        """
+        df = self._tables(path)[0].copy()
+        if invert:
+            df.sort_index(axis=0, level=1, inplace=True)
+            return df.swaplevel(i=-2, j=-1, axis=0)
+        return df
+
+    def small_df(self,
+                 path: archive.Source,
+                 columns: list or tuple,
+                 invert: bool = None) -> pd.DataFrame:
+        """
+        Аналог Jobs(path).small_df(columns, invert)
+        """
+        _small_df = self._tables(path)[0].loc[:, list(columns)].copy()
+        if invert:
+            _small_df.sort_index(axis=0, level=1, inplace=True)
+            return _small_df.swaplevel(i=-2, j=-1, axis=0)
+        return _small_df
+
+    def settings_df(self, path: archive.Source) -> pd.DataFrame:
+        """
+        Аналог Jobs(path).settings_df()
+        """
+        return self._tables(path)[1].settings_df()
+
+    def settings_table(self, path: archive.Source) -> SettingsTable:
+        """
+        Аналог Jobs(path).settings_table(), таблица общая и только для чтения
+        """
+        return self._tables(path)[1]
+
+    def compound_index(self, path: archive.Source) -> 'CompoundIndex':
+        """
+        Индекс веществ файла, см. CompoundIndex. Строится при первом
+        обращении и хранится вместе с таблицами файла
+        """
+        entry = self._entry(path)
+        if entry[4] is None:
+            entry[4] = CompoundIndex(entry[2])
+            entry[5] += entry[4].nbytes
+            self._size += entry[4].nbytes
+            self._evict()
+        return entry[4]
+
+    def clear(self):
+        self._entries.clear()
+        self._size = 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Число файлов в реестре, попаданий, промахов и размер таблиц в байтах
+        """
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': self._size
+        }
+
+
+_default_registry: Optional[JobsRegistry] = None
+
+
+def default_registry() -> JobsRegistry:
+    """
+    Общий для процесса реестр *.tab файлов, лимит памяти в мегабайтах
+    задается переменной окружения COSMORC_TAB_MEMORY_MB, число процессов
+    для разбора одного файла - COSMORC_TAB_WORKERS
+    """
+    global _default_registry
+    if _default_registry is None:
+        limit = os.environ.get('COSMORC_TAB_MEMORY_MB')
+        _default_registry = JobsRegistry(
+            int(float(limit) * 2**20) if limit else REGISTRY_MAX_BYTES,
+            workers=int(os.environ.get('COSMORC_TAB_WORKERS', 1)))
+    return _default_registry
+
+
+# Колонки таблицы COSMOtherm, которые записываются как целые числа
+INTEGER_COLUMNS = ('Nr', )
+
+CONVERT_FORMATS = ('.csv', '.parquet')
+
+# Сколько символов строк таблицы данных копится в памяти до записи
+# во временный файл, см. _CsvDataWriter
+SPOOL_BUFFER_SIZE = 8 * 2**20
+
+
+class _CsvDataWriter:
+    """
+    Пишет таблицу данных в том же виде, что и
+    Jobs.small_df(invert=1).to_csv(): строки отсортированы по веществу,
+    затем по работе. Строки копятся в памяти по веществам и при
+    превышении buffer_size сбрасываются в один временный файл, для
+    каждого вещества запоминаются смещения его кусков. При закрытии
+    куски читаются в порядке веществ, поэтому число открытых файлов
+    не зависит от числа веществ
+    """
+
+    def __init__(self,
+                 path: str,
+                 columns: Tuple[str],
+                 buffer_size: int = SPOOL_BUFFER_SIZE):
+        self.path = path
+        self.columns = columns
+        self.buffer_size = buffer_size
+        self._spool = tempfile.TemporaryFile()
+        self._buffer: Dict[str, List[str]] = {}
+        self._buffered = 0
+        # Вещество -> [(смещение, длина)] кусков во временном файле
+        self._segments: Dict[str, List[Tuple[int, int]]] = {}
+
+    def write(self, job_indx: int, compounds: List[str], values: np.ndarray):
+        integer = [column in INTEGER_COLUMNS for column in self.columns]
+        for compound, row in zip(compounds, values.tolist()):
+            line = ','.join([compound, str(job_indx)] + [
+                str(int(value)) if is_int else repr(value)
+                for value, is_int in zip(row, integer)
+            ]) + '\n'
+            self._buffer.setdefault(compound, []).append(line)
+            self._buffered += len(line)
+        if self._buffered >= self.buffer_size:
+            self._flush()
+
+    def _flush(self):
+        for compound, lines in self._buffer.items():
+            data = ''.join(lines).encode('utf-8')
+            self._segments.setdefault(compound, []).append(
+                (self._spool.tell(), len(data)))
+            self._spool.write(data)
+        self._buffer = {}
+        self._buffered = 0
+
+    def close(self):
+        try:
+            self._flush()
+            with open(self.path, 'w') as data_file:
+                data_file.write(','.join(('Compound', 'Job') + self.columns) +
+                                '\n')
+                for compound in sorted(self._segments):
+                    for offset, length in self._segments[compound]:
+                        self._spool.seek(offset)
+                        data_file.write(
+                            self._spool.read(length).decode('utf-8'))
+        finally:
+            self._spool.close()
+
+
+class _ParquetDataWriter:
+    """
+    Пишет таблицу данных в *.parquet, по одной группе строк на
+    batch работ, строки идут в порядке работ в файле
+    """
+
+    def __init__(self, path: str, columns: Tuple[str], batch: int = 256):
+        import pyarrow.parquet as pq
+        self._pq = pq
+        self.path = path
+        self.columns = columns
+        self.batch = batch
+        self._writer = None
+        self._frames = []
+
+    def write(self, job_indx: int, compounds: List[str], values: np.ndarray):
+        frame = pd.DataFrame({'Compound': compounds, 'Job': job_indx})
+        for i, column in enumerate(self.columns):
+            frame[column] = values[:, i].astype(
+                np.int64 if column in INTEGER_COLUMNS else np.float64)
+        self._frames.append(frame)
+        if len(self._frames) >= self.batch:
+            self._flush()
+
+    def _flush(self):
+        import pyarrow
+        if not self._frames:
+            return
+        table = pyarrow.Table.from_pandas(pd.concat(self._frames,
+                                                    ignore_index=True),
+                                          preserve_index=False)
+        self._frames = []
+        if self._writer is None:
+            self._writer = self._pq.ParquetWriter(self.path, table.schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        self._flush()
+        if self._writer is not None:
+            self._writer.close()
+
+
+def convert_tab(file_path: str,
+                data_path: str,
+                settings_path: str,
+                columns: Tuple[str] = ('Gsolv', 'ln(gamma)', 'Nr')):
+    """
+    Потоковая конвертация *.tab файла в таблицы данных и настроек.
+    Работы читаются и записываются по одной, поэтому память не зависит
+    от размера файла (в памяти остаются только значения настроек).
+    Формат выбирается по расширению: *.csv или *.parquet (нужен pyarrow).
+
+    *.csv файлы совпадают с Jobs.small_df(invert=1).to_csv() и
+    Jobs.settings_df().to_csv(). В *.parquet данные идут в порядке работ,
+    а настройки записываются по строке на работу.
+
+    Arguments
+    ---------
+    file_path: str
+        Путь к *.tab файлу
+
+    data_path: str
+        Путь к таблице данных
+
+    settings_path: str
+        Путь к таблице настроек
+
+    columns: Tuple[str]
+        Колонки таблицы данных
+    """
+    columns = tuple(columns)
+    suffix = os.path.splitext(data_path)[1].lower()
+    if suffix == '.csv':
+        writer = _CsvDataWriter(data_path, columns)
+    elif suffix == '.parquet':
+        writer = _ParquetDataWriter(data_path, columns)
+    else:
+        raise ValueError(f'use one of {", ".join(CONVERT_FORMATS)}')
+    settings = []
+    try:
+        for lines in iter_jobs(file_path):
+            job = Job(lines)
+            values = np.zeros((len(job.compounds), len(columns)))
+            for i, column in enumerate(columns):
+                if column in job.columns:
+                    values[:, i] = job.parameters[:, job.columns.index(column)]
+            values[np.isnan(values)] = 0
+            writer.write(job.job_indx, job.compounds, values)
+            settings.append(
+                (job.job_indx, job.setting_values, job.setting_units))
+    finally:
+        writer.close()
+    settings = SettingsTable.from_records(settings)
+    if os.path.splitext(settings_path)[1].lower() == '.parquet':
+        settings.frame().reset_index().to_parquet(settings_path, index=False)
+    else:
+        settings.settings_df().to_csv(settings_path, header=True)
 
 
 def main():
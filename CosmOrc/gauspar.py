@@ -1,9 +1,14 @@
+import mmap
 import os
 import re
-from typing import Any, List, Tuple, Union
+from typing import Any, Iterable, Iterator, List, Optional, Tuple, Union
 
+import numpy as np
 import pandas as pd
 
+import CosmOrc.archive as archive
+from CosmOrc.linematch import LineClassifier
+from CosmOrc.record import ThermoRecord, records_frame
 from CosmOrc.setting import Setting
 
 EH_JMOL = 4.359744 * 6.022e5
@@ -22,6 +27,36 @@ PROPERTIES_LIST = [
     'Total', 'Electronic', 'Translational', 'Rotational', 'Vibrational'
 ]
 
+# Категории строк в порядке приоритета разбора в file_pars
+LINE_CLASSIFIER = LineClassifier([
+    ('freq', ('Frequencies', )),
+    ('parameter', PARAMETER_LIST),
+    ('properties', PROPERTIES_LIST),
+    ('temperature', ('Temperature', )),
+    ('mass', ('Molecular mass', )),
+    ('scf', ('SCF Done', )),
+    ('natoms', ('NAtoms', )),
+    ('point_group', ('Full point group', )),
+    ('freedom', ('Deg. of freedom', )),
+])
+
+# Строки, которые нужны только в последнем вхождении
+SCALAR_KEYS = (('freedom', b'Deg. of freedom'), ('point_group',
+                                                   b'Full point group'),
+               ('natoms', b'NAtoms'), ('scf', b'SCF Done'))
+
+FREQUENCIES_REGEX = re.compile(r'Frequencies\s--((?:\s+-?[\d.]+)+)\s*$')
+
+THERMOCHEMISTRY_MARKER = b'- Thermochemistry -'
+FREQUENCIES_MARKER = b'Harmonic frequencies'
+LINK1_MARKER = b'Proceeding to internal job step number'
+
+# Типы шагов в порядке приоритета, шаг без ключевых слов считается 'sp'.
+# freq идет первым: шаг 'opt freq' - это шаг с частотами
+JOB_TYPES = (('freq', re.compile(r'\bfreq\b')), ('opt',
+                                                 re.compile(r'\bopt\b')),
+             ('irc', re.compile(r'\birc\b')), ('scan', re.compile(r'\bscan\b')))
+
 # ^\s+(\d+)\s+\d+\s+\d+\s+\-?[\d.]+\s+\-?[\d.]+\s+\-?[\d.]+$ для атомов
 
 
@@ -56,7 +91,194 @@ def list_unpack(some_list: Union[List, Tuple]) -> List:
     return new_list
 
 
-def read_data_gaussian(file_path: Union[str, 'os.PathLike[Any]']) -> List:
+class LinkStep:
+    """
+    Один шаг (--Link1--) многошагового расчета Gaussian
+
+    Attributes
+    ----------
+    number: int
+        Номер шага, как в строке 'Proceeding to internal job step number',
+        нумерация начинается с 1
+
+    start, stop: int
+        Смещения начала и конца шага в файле, в байтах
+
+    job_type: str
+        'opt', 'freq', 'irc', 'scan' или 'sp'
+
+    route: str
+        Route секция шага
+
+    thermochemistry: bool
+        Есть ли в шаге блок термохимии
+    """
+
+    __slots__ = ('number', 'start', 'stop', 'job_type', 'route',
+                 'thermochemistry')
+
+    def __init__(self,
+                 number: int,
+                 start: int,
+                 stop: int,
+                 route: str,
+                 thermochemistry: bool = False):
+        self.number = number
+        self.start = start
+        self.stop = stop
+        self.route = route
+        self.thermochemistry = thermochemistry
+        self.job_type = 'sp'
+        for job_type, regex in JOB_TYPES:
+            if regex.search(route.lower()):
+                self.job_type = job_type
+                break
+
+    def __repr__(self):
+        return '{} {} [{}:{}] {}'.format(self.number, self.job_type,
+                                         self.start, self.stop, self.route)
+
+
+def _route_at(data: mmap.mmap, start: int, stop: int) -> str:
+    """
+    Возвращает route секцию (строки от ' #' до строки из дефисов)
+    первую после смещения start
+    """
+    begin = data.find(b'\n #', start, stop)
+    if begin == -1:
+        return ''
+    end = data.find(b'\n --', begin + 1, stop)
+    end = stop if end == -1 else end
+    route = data[begin + 2:end].decode('utf-8', errors='replace')
+    # Длинная route секция переносится на несколько строк
+    return ''.join(line.strip() for line in route.splitlines())
+
+
+def _index_link_steps_stream(file_path: archive.Source) -> List[LinkStep]:
+    """
+    Аналог index_link_steps для сжатых файлов и файлов из архивов,
+    которые нельзя отобразить в память: один построчный проход
+    по распакованному потоку
+    """
+    starts, routes, thermochemistry = [0], [''], [False]
+    route_lines = None
+    pos = 0
+    with archive.open_binary(file_path) as data_file:
+        for line in data_file:
+            if LINK1_MARKER in line:
+                starts.append(pos)
+                routes.append('')
+                thermochemistry.append(False)
+            elif THERMOCHEMISTRY_MARKER in line:
+                thermochemistry[-1] = True
+            elif route_lines is not None:
+                if line.startswith(b' --'):
+                    routes[-1] = ''.join(route_lines)
+                    route_lines = None
+                else:
+                    route_lines.append(
+                        line.decode('utf-8', errors='replace').strip())
+            elif not routes[-1] and line.startswith(b' #'):
+                route_lines = [
+                    line[1:].decode('utf-8', errors='replace').strip()
+                ]
+            pos += len(line)
+    if route_lines is not None:
+        routes[-1] = ''.join(route_lines)
+    if not pos:
+        return []
+    stops = starts[1:] + [pos]
+    return [
+        LinkStep(number, *step)
+        for number, step in enumerate(
+            zip(starts, stops, routes, thermochemistry), 1)
+    ]
+
+
+def index_link_steps(file_path: Union[str, 'os.PathLike[Any]']
+                     ) -> List[LinkStep]:
+    """
+    Быстрый проход по файлу Gaussian, находит границы всех шагов
+    --Link1-- и их тип, сами шаги не разбираются
+
+    Parameters
+    ---------
+    file_path: str, 'os.PathLike[Any]'
+        Путь к *.out файлу Gaussian
+
+    Returns
+    ------
+    steps: List[LinkStep]
+        Шаги в порядке их следования в файле
+    """
+    if not archive.is_plain_file(file_path):
+        return _index_link_steps_stream(file_path)
+    size = os.path.getsize(file_path)
+    if not size:
+        return []
+    with open(file_path, 'rb') as data_file, mmap.mmap(
+            data_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        starts = [0]
+        pos = data.find(LINK1_MARKER)
+        while pos != -1:
+            starts.append(data.rfind(b'\n', 0, pos) + 1)
+            pos = data.find(LINK1_MARKER, pos + len(LINK1_MARKER))
+        stops = starts[1:] + [size]
+        return [
+            LinkStep(number, start, stop, _route_at(data, start, stop),
+                     data.find(THERMOCHEMISTRY_MARKER, start, stop) != -1)
+            for number, (start, stop) in enumerate(zip(starts, stops), 1)
+        ]
+
+
+def select_link_step(file_path: Union[str, 'os.PathLike[Any]'],
+                     step: int = None) -> Optional[LinkStep]:
+    """
+    Выбирает шаг расчета для парсинга. Если step не указан, выбирается
+    последний шаг с блоком термохимии, затем последний шаг с частотами
+    (freq в route), а если таких шагов нет, возвращается None и файл
+    разбирается целиком
+
+    Raises
+    ------
+    ValueError
+        Шага с номером step нет в файле
+    """
+    steps = index_link_steps(file_path)
+    if step is None:
+        for candidates in ([x for x in steps if x.thermochemistry],
+                           [x for x in steps if x.job_type == 'freq']):
+            if candidates:
+                return candidates[-1]
+        return None
+    for link_step in steps:
+        if link_step.number == step:
+            return link_step
+    raise ValueError(
+        f'{file_path} has {len(steps)} job steps, step {step} not found')
+
+
+def _read_lines(file_path: Union[str, 'os.PathLike[Any]'],
+                link_step: LinkStep = None) -> Iterator[str]:
+    """
+    Построчное чтение всего файла или только одного шага расчета
+    """
+    if link_step is None:
+        with archive.open_text(file_path) as data_file:
+            yield from data_file
+    else:
+        with archive.open_binary(file_path) as data_file:
+            data_file.seek(link_step.start)
+            pos = link_step.start
+            for line in data_file:
+                if pos >= link_step.stop:
+                    break
+                pos += len(line)
+                yield line.decode('utf-8', errors='replace')
+
+
+def read_data_gaussian(file_path: Union[str, 'os.PathLike[Any]'],
+                       step: int = None) -> List:
     """
     Функция для чтения данных из Gaussian. Проверяет есть ли
     термохимические данные в файле, и считывает нужные строки
@@ -66,11 +288,15 @@ def read_data_gaussian(file_path: Union[str, 'os.PathLike[Any]']) -> List:
     file_path: str, 'os.PathLike[Any]'
         Путь к *.out файлу Gaussian
 
+    step: int
+        Номер шага --Link1--, см. select_link_step
+
     Returns
     ------
-    matching: Tuple
-        Кортеж в который входят все строки содержащие в себе
-        элементы списков PARAMETER_LIST или PROPERTIES_LIST
+    matching: List[Tuple[str, str]]
+        Список пар (метка, строка), метки присваиваются LINE_CLASSIFIER.
+        В список входят все строки содержащие в себе элементы списков
+        PARAMETER_LIST или PROPERTIES_LIST
 
     Raises
     ------
@@ -78,34 +304,135 @@ def read_data_gaussian(file_path: Union[str, 'os.PathLike[Any]']) -> List:
         Возникает при отсутствие "обязательных строк", строки содержат общую
         информацию о структуре, поэтому их отсутствие является ошибкой
     """
-    matching: List[str] = []
-    scf_energy: str
-    with open(file_path, 'r') as data_file:
-        for line in data_file:
-            if any(xs in line for xs in (
-                    PARAMETER_LIST + PROPERTIES_LIST +
-                ['Frequencies', 'Temperature', 'Molecular mass'])):
-                matching.append(line)
-            # Нужно только последнее значение для каждой из строк
-            # Эти строки должны встречаться в любом файле Gaussian
-            # Поэтому их отсутствие является ошибкой
-            if 'SCF Done' in line:
-                scf_energy = line
-            if 'NAtoms' in line:
-                d_line = line
-            if 'Full point group' in line:
-                sym_line = line
-            if 'Deg. of freedom' in line:
-                free_line = line
-        try:
-            matching.append(free_line)
-            matching.append(sym_line)
-            matching.append(d_line)
-            matching.append(scf_energy)
-        except UnboundLocalError as err:
-            raise err
-        except Exception as err:
-            raise err
+    matching: List[Tuple[str, str]] = []
+    scf_energy: Tuple[str, str]
+    for label, line in LINE_CLASSIFIER.classify_lines(
+            _read_lines(file_path, select_link_step(file_path, step))):
+        # Нужно только последнее значение для каждой из строк
+        # Эти строки должны встречаться в любом файле Gaussian
+        # Поэтому их отсутствие является ошибкой
+        if label == 'scf':
+            scf_energy = (label, line)
+        elif label == 'natoms':
+            d_line = (label, line)
+        elif label == 'point_group':
+            sym_line = (label, line)
+        elif label == 'freedom':
+            free_line = (label, line)
+        else:
+            matching.append((label, line))
+    try:
+        matching.append(free_line)
+        matching.append(sym_line)
+        matching.append(d_line)
+        matching.append(scf_energy)
+    except UnboundLocalError as err:
+        raise err
+    except Exception as err:
+        raise err
+    return matching
+
+
+def _line_at(data: mmap.mmap, pos: int) -> str:
+    """
+    Возвращает целиком строку файла, в которую входит байт с номером pos
+    """
+    start = data.rfind(b'\n', 0, pos) + 1
+    stop = data.find(b'\n', pos)
+    stop = len(data) if stop == -1 else stop + 1
+    return data[start:stop].decode('utf-8', errors='replace')
+
+
+def _last_thermochemistry_step(data: mmap.mmap
+                               ) -> Optional[Tuple[int, int]]:
+    """
+    Границы шага --Link1-- с последним блоком термохимии, найденные
+    поиском с конца файла. Совпадают с границами LinkStep из
+    index_link_steps, но файл целиком не просматривается.
+    Если термохимии нет, возвращается None
+    """
+    pos = data.rfind(THERMOCHEMISTRY_MARKER)
+    if pos == -1:
+        return None
+    start = data.rfind(LINK1_MARKER, 0, pos)
+    start = 0 if start == -1 else data.rfind(b'\n', 0, start) + 1
+    stop = data.find(LINK1_MARKER, pos)
+    stop = len(data) if stop == -1 else data.rfind(b'\n', 0, stop) + 1
+    return start, stop
+
+
+def read_data_gaussian_tail(file_path: Union[str, 'os.PathLike[Any]'],
+                            step: int = None) -> List:
+    """
+    Функция для чтения данных из Gaussian с конца файла. Файл отображается
+    в память, после чего ищется последний блок термохимии (вместе с
+    предшествующим ему блоком частот) и последние вхождения строк из
+    SCALAR_KEYS. Разбирается только найденный блок, поэтому время чтения
+    не зависит от длины предшествующей оптимизации.
+
+    Parameters
+    ---------
+    file_path: str, 'os.PathLike[Any]'
+        Путь к *.out файлу Gaussian
+
+    step: int
+        Номер шага --Link1--, если не указан, выбирается тот же шаг,
+        что и в read_data_gaussian (см. select_link_step)
+
+    Returns
+    ------
+    matching: List[Tuple[str, str]]
+        Список пар (метка, строка) в том же формате,
+        что и у read_data_gaussian
+
+    Raises
+    ------
+    UnboundLocalError
+        Возникает при отсутствие "обязательных строк", см. read_data_gaussian
+    """
+    if (not archive.is_plain_file(file_path)
+            or not os.path.getsize(file_path)):
+        # Пустые и сжатые файлы нельзя отобразить в память
+        return read_data_gaussian(file_path, step=step)
+
+    matching: List[Tuple[str, str]] = []
+    with open(file_path, 'rb') as data_file, mmap.mmap(
+            data_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        low, high = 0, len(data)
+        if step is None:
+            bounds = _last_thermochemistry_step(data)
+        else:
+            bounds = None
+        if bounds is not None:
+            low, high = bounds
+        else:
+            # Явно указанный шаг или файл без термохимии: нужен индекс шагов
+            link_step = select_link_step(file_path, step)
+            if link_step is not None:
+                low, high = link_step.start, link_step.stop
+
+        start = data.rfind(THERMOCHEMISTRY_MARKER, low, high)
+        if start == -1:
+            # Термохимии нет, разбираем весь файл (шаг)
+            start = low
+        else:
+            freq_start = data.rfind(FREQUENCIES_MARKER, low, start)
+            if freq_start != -1:
+                start = freq_start
+            start = data.rfind(b'\n', low, start) + 1 or low
+
+        scalar_labels = [label for label, _ in SCALAR_KEYS]
+        block = data[start:high].decode('utf-8', errors='replace')
+        for label, line in LINE_CLASSIFIER.scan(block):
+            if label not in scalar_labels:
+                matching.append((label, line))
+
+        for label, key in SCALAR_KEYS:
+            pos = data.rfind(key, low, high)
+            if pos == -1:
+                raise UnboundLocalError(
+                    f'{key.decode()} line is missing in {file_path}')
+            matching.append((label, _line_at(data, pos)))
     return matching
 
 
@@ -180,7 +507,7 @@ def tp_pars(some_str: str) -> List:
         ]
 
 
-def freq_pars(some_str: str) -> list:
+def freq_pars(some_str: str) -> List[str]:
     """
     Функция для парсинга частот
 
@@ -191,23 +518,18 @@ def freq_pars(some_str: str) -> list:
 
     Return
     ------
-        Возвращает список содержащий в себе объекты класса Setting,
-        с значениями частот в cm**-1.
-    """
-    _current_freq_ = []
-    _name_ = r'(\w+)'
-    _freq_value_ = r'([-\d.]+)'
-    _reg_str = _name_ + r'\s\-\-\s*'
-    # Когда в строке не 3 частоты
-    # Мы можем учесть это размером регулярного выражения
-    for i in range(len(some_str.split()) - 2):
-        _reg_str += _freq_value_ + r'\s*'
-    freq_str = re.search(_reg_str, some_str)
+        Возвращает список строк со значениями частот в cm**-1,
+        в числа они переводятся сразу для всего файла в file_pars
+
+    Example
+    -------
+    >>> freq_pars(' Frequencies --   1357.2345   1357.2345   1566.5000')
+    ['1357.2345', '1357.2345', '1566.5000']
+    """
+    freq_str = FREQUENCIES_REGEX.search(some_str)
     if freq_str:
-        for i in range(2, len(some_str.split())):
-            _current_freq_.append(
-                Setting(name='freq.', value=freq_str.group(i), unit='cm**-1'))
-    return _current_freq_
+        return freq_str.group(1).split()
+    return []
 
 
 def parameter_pars(some_str: str) -> Setting:
@@ -260,10 +582,11 @@ def properties_pars(some_str: str) -> Setting:
                        unit='Cal/mol*K').convert(koef=4.184, unit='J/mol*K')
 
 
-def file_pars(file_path: str) -> pd.Series:
+def file_pars(file_path: str, tail: bool = False,
+              step: int = None) -> ThermoRecord:
     """
     Принимает на вход путь к файлу, и парсит его, возвращая результаты в виде
-    pandas.Series, если в файле не было данных или нужного файла не существует
+    ThermoRecord, если в файле не было данных или нужного файла не существует
     вылетит с ошибкой.
 
     Parameters
@@ -271,38 +594,49 @@ def file_pars(file_path: str) -> pd.Series:
     file_path : str
         Путь к файлу *.out
 
+    tail : bool
+        Читать файл с конца, см. read_data_gaussian_tail
+
+    step : int
+        Номер шага --Link1--, по умолчанию последний расчет частот
+
     Returns
     -------
-    pd.Series
-        Серия содержит термохимические и структурные параметры,
-        необходимые для дальнейшего получения термодинамических данных
+    ThermoRecord
+        Запись содержит термохимические и структурные параметры,
+        необходимые для дальнейшего получения термодинамических данных,
+        в pd.Series переводится методом to_series
     """
-    read_data = read_data_gaussian(file_path)
+    if tail:
+        read_data = read_data_gaussian_tail(file_path, step=step)
+    else:
+        read_data = read_data_gaussian(file_path, step=step)
     _all_parameters = []
+    _freq_tokens: List[str] = []
     if read_data:
-        for line in read_data:
-            if 'Frequencies' in line:
-                _all_parameters.append(freq_pars(line))
-            elif any(xs in line for xs in PARAMETER_LIST):
+        for label, line in read_data:
+            if label == 'freq':
+                _freq_tokens.extend(freq_pars(line))
+            elif label == 'parameter':
                 _all_parameters.append(parameter_pars(line))
-            elif any(xs in line for xs in PROPERTIES_LIST):
+            elif label == 'properties':
                 _all_parameters.append(properties_pars(line))
-            elif 'Temperature' in line:
+            elif label == 'temperature':
                 _all_parameters.append(tp_pars(line))
-            elif 'Molecular mass' in line:
+            elif label == 'mass':
                 _all_parameters.append(molecular_mass_pars(line))
-            elif 'SCF Done' in line:
+            elif label == 'scf':
                 _all_parameters.append(scf_energy_pars(line))
-            elif 'NAtoms' in line:
+            elif label == 'natoms':
                 _all_parameters.append(
                     Setting(name='natoms', value=line.split()[1], unit='n'))
-            elif 'Full point group' in line:
+            elif label == 'point_group':
                 sym_line = line.split()[3]
                 _all_parameters.append(
                     Setting(name=line.split()[4],
                             value=line.split()[5],
                             unit=''))
-            elif 'Deg. of freedom' in line:
+            elif label == 'freedom':
                 _all_parameters.append(
                     Setting(name='deg. of freedom',
                             value=line.split()[3],
@@ -312,26 +646,36 @@ def file_pars(file_path: str) -> pd.Series:
 
     raw_data = list_unpack(_all_parameters)
     data = [parameter for parameter in raw_data if parameter is not None]
-    # TODO Comments
-    if data:
-        indexes = [parameter.name for parameter in data]
-        series = pd.Series(data=[x.value for x in data],
-                           name='parameters',
-                           index=indexes)
-        series.loc['full point group'] = sym_line
-        series.loc['qm_program'] = 'gaussian'
-        if series.loc['natoms'] == 1:
-            series.loc['atom'] = True
-            series.loc['linear'] = True
-        else:
-            series.loc['atom'] = False
-            if series.loc['deg. of freedom'] == 1:
-                series.loc['linear'] = True
-            elif series.loc[
-                    'natoms'] > 1 and series.loc['natoms'] * 3 - 5 == len(
-                        series.loc['freq.']):
-                series.loc['linear'] = True
-            else:
-                series.loc['linear'] = False
-        return series
-    # TODO Fixme
+    if not data:
+        raise ValueError(f'{file_path} does not contain thermochemistry data')
+    # Все частоты переводятся в числа одним вызовом
+    freqs = np.array(_freq_tokens, dtype=np.float64)
+    return ThermoRecord.from_settings(data,
+                                      freqs=freqs,
+                                      qm_program='gaussian',
+                                      point_group=sym_line)
+
+
+def file_pars_many(paths: Iterable[str], tail: bool = False,
+                   step: int = None) -> pd.DataFrame:
+    """
+    Парсит набор файлов и возвращает одну таблицу, по строке на файл,
+    см. record.records_frame. Таблицу можно записать одним файлом
+    с помощью record.write_table
+
+    Parameters
+    ----------
+    paths : Iterable[str]
+        Пути к файлам *.out
+
+    tail, step :
+        См. file_pars
+
+    Returns
+    -------
+    pd.DataFrame
+        Индекс - пути к файлам, частоты в столбце 'freqs'
+    """
+    return records_frame(
+        {str(path): file_pars(path, tail=tail, step=step)
+         for path in paths})
@@ -0,0 +1,136 @@
+import re
+from typing import Dict, Iterable, Iterator, Optional, Sequence, Tuple
+
+# Примерный размер текста (символы), который просматривается одним
+# вызовом регулярного выражения в classify_lines
+SCAN_BLOCK_SIZE = 1 << 22
+
+
+class LineClassifier:
+    """
+    Классификатор строк выходных файлов квантово-химических программ.
+    Все ключевые слова собираются в одно скомпилированное регулярное
+    выражение. Текст файла просматривается им большими блоками (scan,
+    classify_lines), а не построчно: вызов регулярного выражения на
+    каждой строке обходится дороже, чем проверки подстрок, а в блоке
+    строки без ключевых слов вообще не выделяются.
+
+    Arguments
+    ---------
+    categories: Sequence[Tuple[str, Iterable[str]]]
+        Пары (метка, ключевые слова) в порядке убывания приоритета.
+        Если в строке встречаются ключевые слова нескольких категорий,
+        строке присваивается метка категории с наивысшим приоритетом
+
+    Example
+    -------
+    >>> classifier = LineClassifier([('freq', ('Frequencies',)),
+    ...                              ('tp', ('Temperature', 'Pressure'))])
+    >>> classifier.classify(' Frequencies --  1357.2345')
+    'freq'
+    >>> classifier.classify(' Temperature 298.150 Kelvin.  Pressure 1.0 Atm.')
+    'tp'
+    >>> classifier.classify(' Normal termination') is None
+    True
+    >>> list(classifier.scan(' Frequencies --  1357.2345\\n Done\\n'))
+    [('freq', ' Frequencies --  1357.2345\\n')]
+    """
+
+    __slots__ = ('labels', '_ranks', '_keywords', '_regex')
+
+    def __init__(self, categories: Sequence[Tuple[str, Iterable[str]]]):
+        self.labels = tuple(label for label, _ in categories)
+        self._ranks: Dict[str, int] = {
+            label: rank
+            for rank, label in enumerate(self.labels)
+        }
+        # Ключевое слово -> ранг категории, при повторе слова остается
+        # более приоритетная категория
+        self._keywords: Dict[str, int] = {}
+        for label, keywords in categories:
+            for keyword in keywords:
+                self._keywords.setdefault(keyword, self._ranks[label])
+        # Альтернативы идут в порядке приоритета, поэтому при совпадении
+        # в одной позиции побеждает более приоритетная категория.
+        # Выражение без именованных групп: для него re заранее знает
+        # возможные первые символы и быстро пропускает остальной текст
+        self._regex = re.compile('|'.join(
+            re.escape(keyword) for keyword in self._keywords))
+
+    def classify(self, line: str) -> Optional[str]:
+        """
+        Возвращает метку категории строки или None, если в строке
+        нет ни одного ключевого слова
+
+        Parameters
+        ----------
+        line: str
+            Строка для классификации
+
+        Returns
+        -------
+        label: str or None
+            Метка категории с наивысшим приоритетом
+        """
+        best = None
+        for match in self._regex.finditer(line):
+            rank = self._keywords[match.group()]
+            if rank == 0:
+                return self.labels[0]
+            if best is None or rank < best:
+                best = rank
+        if best is not None:
+            return self.labels[best]
+
+    def scan(self, text: str) -> Iterator[Tuple[str, str]]:
+        """
+        Просматривает текст одним проходом регулярного выражения и
+        возвращает пары (метка, строка) для строк с ключевыми словами,
+        в порядке следования строк. Метка та же, что у classify, строка
+        возвращается вместе с символом перевода строки
+
+        Parameters
+        ----------
+        text: str
+            Несколько строк текста
+        """
+        ranks = self._keywords
+        stop = -1
+        best = None
+        for match in self._regex.finditer(text):
+            pos = match.start()
+            rank = ranks[match.group()]
+            if pos < stop:
+                # Еще одно ключевое слово в той же строке
+                if rank < best:
+                    best = rank
+                continue
+            if best is not None:
+                yield self.labels[best], text[start:stop]
+            start = text.rfind('\n', 0, pos) + 1
+            stop = text.find('\n', pos)
+            stop = len(text) if stop == -1 else stop + 1
+            best = rank
+        if best is not None:
+            yield self.labels[best], text[start:stop]
+
+    def classify_lines(self,
+                       lines: Iterable[str],
+                       block_size: int = SCAN_BLOCK_SIZE
+                       ) -> Iterator[Tuple[str, str]]:
+        """
+        То же, что scan, для потока строк (например, открытого файла):
+        строки склеиваются в блоки примерно по block_size символов,
+        поэтому весь файл в памяти не держится
+        """
+        block = []
+        size = 0
+        for line in lines:
+            block.append(line)
+            size += len(line)
+            if size >= block_size:
+                yield from self.scan(''.join(block))
+                block = []
+                size = 0
+        if block:
+            yield from self.scan(''.join(block))
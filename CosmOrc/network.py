@@ -0,0 +1,175 @@
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from CosmOrc.batch import CompoundBatch
+from CosmOrc.reactions import VIB_CHUNK_SIZE, Compound
+
+
+class ReactionNetwork:
+    """
+    Набор реакций, собранный в одну разреженную стехиометрическую
+    матрицу S (реакции x вещества, CSR: data, indices, indptr).
+    Продукты входят с положительными коэффициентами, реагенты -
+    с отрицательными. Энергии Гиббса всех веществ считаются одним
+    проходом CompoundBatch, а ΔG всех реакций - одним произведением
+    S @ G, вместо суммы таблиц по каждому веществу каждой реакции.
+
+    Arguments
+    ---------
+    reactions: Sequence[Tuple[str, str]]
+        Пары (имя, реакция), реакция в формате Reaction: '2*A + 3*C = D'
+
+    compounds: Sequence[Compound]
+        Вещества, в матрицу попадают только встречающиеся в реакциях
+
+    dtype: np.dtype
+        Точность сеток энергии Гиббса, см. CompoundBatch
+
+    chunk_size: int
+        Максимальный размер промежуточного массива (ненулевые элементы S
+        x точки сетки)
+
+    Attributes
+    ----------
+    names: List[str]
+        Имена реакций, строки S
+
+    compounds: List[Compound]
+        Вещества, столбцы S
+
+    data, indices, indptr: np.ndarray
+        Коэффициенты, номера веществ и границы строк S
+
+    batch: CompoundBatch
+        Векторизованный расчет G(T, P) веществ
+
+    Example
+    -------
+    >>> network = ReactionNetwork([('d', '2*A = A2')], compounds)
+    >>> network.g_reactions(np.arange(250, 400, 5), np.array([1])).shape
+    (1, 1, 30)
+    """
+
+    __slots__ = ('names', 'reactions', 'compounds', 'data', 'indices',
+                 'indptr', 'batch', 'chunk_size')
+
+    def __init__(self,
+                 reactions: Sequence[Tuple[str, str]],
+                 compounds: Sequence[Compound],
+                 dtype: np.dtype = np.float64,
+                 chunk_size: int = VIB_CHUNK_SIZE):
+        by_name = {compound.name: compound for compound in compounds}
+        self.names = [name for name, _ in reactions]
+        self.reactions = [reaction for _, reaction in reactions]
+        self.chunk_size = chunk_size
+        columns: Dict[str, int] = {}
+        data: List[float] = []
+        indices: List[int] = []
+        indptr = [0]
+        for reaction in self.reactions:
+            for name, coefficient in self.stoichiometry(reaction).items():
+                if name not in by_name:
+                    raise KeyError(f'{name} is missing in compounds')
+                columns.setdefault(name, len(columns))
+                indices.append(columns[name])
+                data.append(coefficient)
+            indptr.append(len(indices))
+        self.compounds = [by_name[name] for name in columns]
+        self.data = np.array(data, dtype=np.float64)
+        self.indices = np.array(indices, dtype=np.intp)
+        self.indptr = np.array(indptr, dtype=np.intp)
+        self.batch = CompoundBatch(self.compounds,
+                                   chunk_size=chunk_size,
+                                   dtype=dtype)
+
+    def __len__(self):
+        return len(self.names)
+
+    @staticmethod
+    def stoichiometry(reaction: str) -> Dict[str, float]:
+        """
+        Коэффициенты веществ в реакции '2*A + 3*C = D': продукты
+        положительные, реагенты отрицательные. Вещество, которое
+        встречается несколько раз, получает сумму коэффициентов
+        """
+        coefficients: Dict[str, float] = {}
+        for sign, element in zip((-1, 1), reaction.split('=')):
+            for compound in element.split('+'):
+                if '*' in compound:
+                    coefficient = float(compound.split('*')[0].strip())
+                    name = compound.split('*')[1].strip()
+                else:
+                    coefficient = 1
+                    name = compound.strip()
+                coefficients[name] = (coefficients.get(name, 0) +
+                                      sign * coefficient)
+        return coefficients
+
+    def matrix(self) -> pd.DataFrame:
+        """
+        Стехиометрическая матрица плотной таблицей реакции x вещества
+        """
+        dense = np.zeros((len(self), len(self.compounds)))
+        rows = np.repeat(np.arange(len(self)), np.diff(self.indptr))
+        np.add.at(dense, (rows, self.indices), self.data)
+        return pd.DataFrame(dense,
+                            index=self.names,
+                            columns=[c.name for c in self.compounds])
+
+    def _dot(self, values: np.array) -> np.array:
+        # S @ values, values - массив вещества x точки сетки
+        out = np.zeros((len(self), values.shape[1]), dtype=values.dtype)
+        filled = np.diff(self.indptr) > 0
+        if not filled.any():
+            return out
+        # Пустые строки пропускаются, как пустые сегменты в CompoundBatch
+        starts = self.indptr[:-1][filled]
+        data = self.data.astype(values.dtype)[:, None]
+        step = max(1, self.chunk_size // max(len(self.indices), 1))
+        for start in range(0, values.shape[1], step):
+            chunk = slice(start, start + step)
+            out[filled, chunk] = np.add.reduceat(
+                data * values[self.indices, chunk], starts, axis=0)
+        return out
+
+    def g_reactions(self, temperature: np.array,
+                    pressure: np.array) -> np.array:
+        """
+        ΔG всех реакций в float64, массив реакции x давления x
+        температуры. В пониженной точности матрица умножается на сетки
+        G - E0, а вклад электронных энергий S @ E0 считается в float64.
+        Порядок суммирования отличается от Reaction.g_reaction (реагенты
+        и продукты в одной сумме), поэтому результаты совпадают с ним
+        с точностью до округления: при G ~ 1e9 Дж/моль это ~1e-6 Дж/моль
+        """
+        temperature = np.atleast_1d(np.asarray(temperature,
+                                               dtype=np.float64))
+        pressure = np.atleast_1d(np.asarray(pressure, dtype=np.float64))
+        shape = (len(self), len(pressure), len(temperature))
+        if not self.compounds:
+            return np.zeros(shape)
+        if self.batch.dtype == np.float64:
+            gibbs = self.batch.gibbs_array(temperature, pressure)
+            return self._dot(gibbs.reshape(len(self.compounds),
+                                           -1)).reshape(shape)
+        reference, gibbs = self.batch.gibbs_relative(temperature, pressure)
+        delta = self._dot(gibbs.reshape(len(self.compounds), -1))
+        return (delta.astype(np.float64) +
+                self._dot(reference[:, None])).reshape(shape)
+
+    def g_reaction(self, temperature: np.array,
+                   pressure: np.array) -> Dict[str, pd.DataFrame]:
+        """
+        ΔG реакций таблицами в формате Reaction.g_reaction: индекс -
+        давления, колонки - температуры
+        """
+        temperature = np.atleast_1d(np.asarray(temperature,
+                                               dtype=np.float64))
+        pressure = np.atleast_1d(np.asarray(pressure, dtype=np.float64))
+        delta = self.g_reactions(temperature, pressure)
+        return {
+            name: pd.DataFrame(index=pressure, columns=temperature, data=g)
+            for name, g in zip(self.names, delta)
+        }
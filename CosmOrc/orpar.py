@@ -1,8 +1,12 @@
 import re
-from typing import Any, List, Tuple, Union
+from typing import Any, Iterable, List, Tuple, Union
 
+import numpy as np
 import pandas as pd
 
+import CosmOrc.archive as archive
+from CosmOrc.linematch import LineClassifier
+from CosmOrc.record import ThermoRecord, records_frame
 from CosmOrc.setting import Setting
 
 EH_JMOL = 4.359744 * 6.022e5
@@ -17,12 +21,25 @@ PARAMETER_LIST = ('Electronic energy', 'Zero point energy',
                   'Temperature', 'Pressure', 'T*S(rot)', 'cm**-1', 'Electronic entropy',
                   'THERMOCHEMISTRY', 'Total enthalpy', 'Final Gibbs free enthalpy')
 
+# Категории строк в порядке приоритета разбора в file_pars
+LINE_CLASSIFIER = LineClassifier([
+    ('tsrot', ('T*S(rot)', )),
+    ('temperature', ('Temperature', )),
+    ('pressure', ('Pressure', )),
+    ('mass', ('Total Mass', )),
+    ('freq', ('cm**-1', )),
+    ('natoms', ('Number of atoms', )),
+    ('freedom', ('Number of degrees of freedom', )),
+    ('thermochemistry', ('THERMOCHEMISTRY', )),
+    ('parameter', PARAMETER_LIST),
+])
+
 
 def read_data_orca(file_path: str = None):
     """
     Функция считывает из файла строки, в которые входят элементы
-    из PARAMETER_LIST, и добавляет их в список matching.
-    Возвращает список только в том случае, если слово
+    из PARAMETER_LIST, и добавляет их в список matching вместе с меткой
+    LINE_CLASSIFIER. Возвращает список только в том случае, если слово
     'THERMOCHEMISTRY' есть в этом списке. Наличие 'THERMOCHEMISTRY'
     автоматически  гарантирует наличие термодинамических данных в файле
 
@@ -34,20 +51,23 @@ def read_data_orca(file_path: str = None):
     Returns
     ------
     matching: list
-        Список со строками, в которые входят строки из
+        Список пар (метка, строка), в который входят строки из
         списка PARAMETER_LIST
     """
 
     matching = []
-    with open(file_path, "r") as data_file:
-        for line in data_file:
-            if any(xs in line for xs in PARAMETER_LIST):
-                matching.append(line)
-            if 'Number of atoms' in line:
-                atm_line = line
-            if 'Number of degrees of freedom' in line:
-                deg_line = line
-    if any('THERMOCHEMISTRY' in s for s in matching):
+    thermochemistry = False
+    with archive.open_text(file_path) as data_file:
+        for label, line in LINE_CLASSIFIER.classify_lines(data_file):
+            if label == 'natoms':
+                atm_line = (label, line)
+            elif label == 'freedom':
+                deg_line = (label, line)
+            else:
+                if label == 'thermochemistry':
+                    thermochemistry = True
+                matching.append((label, line))
+    if thermochemistry:
         try:
             matching.append(atm_line)
             matching.append(deg_line)
@@ -201,10 +221,10 @@ def post_process(element: Setting):
     return element
 
 
-def file_pars(file_path: str = None):
+def file_pars(file_path: str = None) -> ThermoRecord:
     """Функция объединяет в себе все предыдущие функции,
     на вход получает набор готовых данных из read_data_orca,
-    а возвращает объект pd.Series, содержащий в себе все данные из
+    а возвращает объект ThermoRecord, содержащий в себе все данные из
     указанного файла.
 
     Parameters
@@ -214,28 +234,23 @@ def file_pars(file_path: str = None):
 
     Return
     ------
-        Объект pd.Serires (pd == pandas), содержащий в себе
-        данные из исходного файла.
+        Объект ThermoRecord, содержащий в себе данные из исходного файла,
+        в pd.Series переводится методом to_series
     """
     read_data = read_data_orca(file_path)
     _all_parameters = []
     if read_data:
-        for string in reversed(read_data):
-            if 'sn=' in string:
+        for label, string in reversed(read_data):
+            if label == 'tsrot':
                 _all_parameters.append(tsrot_pars(string))
-            elif 'Temperature' in string:
+            elif label == 'temperature':
                 _t = tp_pars(string)
+                _all_parameters.append(_t)
+            elif label in ('pressure', 'mass'):
                 _all_parameters.append(tp_pars(string))
-            elif 'Pressure' in string:
-                _all_parameters.append(tp_pars(string))
-            elif 'Total Mass' in string:
-                _all_parameters.append(tp_pars(string))
-            elif 'cm**-1' in string:
-                if freq_pars(string) != 0:
-                    _all_parameters.append(freq_pars(string))
-            elif 'Number of atoms' in string:
-                _all_parameters.append(name_value_pars(string))
-            elif 'Number of degrees of freedom' in string:
+            elif label == 'freq':
+                _all_parameters.append(freq_pars(string))
+            elif label in ('natoms', 'freedom'):
                 _all_parameters.append(name_value_pars(string))
             else:
                 _all_parameters.append(other_param_pars(string))
@@ -253,26 +268,32 @@ def file_pars(file_path: str = None):
             element.convert(koef=_t.value**(-1), name=new_name)
 
     data = [parameter for parameter in raw_data if parameter is not None]
+    if not data:
+        raise ValueError(f'{file_path} does not contain thermochemistry data')
+
+    freqs = np.array([x.value for x in data if x.name == 'freq.'],
+                     dtype=np.float64)
+    return ThermoRecord.from_settings(
+        [x for x in data if x.name != 'freq.'],
+        freqs=freqs,
+        qm_program='orca')
 
-    if data:
-        indexes = [parameter.name for parameter in data]
-        series = pd.Series(data=[x.value for x in data],
-                           name='parameters', index=indexes)
-        series.loc['qm_program'] = 'orca'
-        if series.loc['natoms'] == 1:
-            series.loc['atom'] = True
-            series.loc['linear'] = True
-        else:
-            series.loc['atom'] = False
-            if series.loc['deg. of freedom'] == 1:
-                series.loc['linear'] = True
-            elif series.loc['natoms'] > 1 and series.loc['natoms']*3 - 5 == len(series.loc['freq.']):
-                series.loc['linear'] = True
-            else:
-                series.loc['linear'] = False
-        return series
 
-    return pd.Series(data=_all_parameters)
+def file_pars_many(paths: Iterable[str]) -> pd.DataFrame:
+    """Парсит набор файлов и возвращает одну таблицу, по строке на файл,
+    см. record.records_frame
+
+    Parameters
+    ---------
+    paths: Iterable[str]
+        Пути к выходным файлам ORCA
+
+    Return
+    ------
+        Объект pd.DataFrame, индекс - пути к файлам,
+        частоты в столбце 'freqs'
+    """
+    return records_frame({str(path): file_pars(path) for path in paths})
 
 
 def main():
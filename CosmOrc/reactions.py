@@ -1,12 +1,15 @@
+import hashlib
+import ntpath
+from collections import OrderedDict
 from itertools import count
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Sequence, Tuple, Union
 
 import numpy as np
 import pandas as pd
 
-import CosmOrc.gauspar as gauspar
-import CosmOrc.orpar as orpar
-from CosmOrc.cospar import Jobs
+import CosmOrc.cache as cache
+from CosmOrc.cospar import default_registry
+from CosmOrc.record import ThermoRecord, frame_records, read_table
 import pysnooper
 
 from yaml import dump, load
@@ -22,16 +25,181 @@ N0 = 6.022_140_85774e-23  # 1/mol
 
 PROGRAM_LIST = ('orca', 'gaussian')
 
+# Максимальное число элементов массива (температуры x моды),
+# обрабатываемого за один раз в колебательных суммах
+VIB_CHUNK_SIZE = 1 << 20
+
+
+# Ограничение памяти кэша сеток одного вещества по умолчанию, байт
+GRID_CACHE_BYTES = 16 * 2**20
+
+# Допустимая точность расчета сеток энергии Гиббса, см. Compound.precision
+PRECISIONS = ('float64', 'float32')
+
+
+class GridCache:
+    """
+    LRU кэш массивов, посчитанных на сетке температур и давлений.
+    Ключ - содержимое массивов сетки, при превышении max_bytes удаляются
+    давно не использованные записи. Сохраненные массивы только для чтения.
+
+    Arguments
+    ---------
+    max_bytes: int
+        Ограничение суммарного размера массивов, байт
+
+    Attributes
+    ----------
+    hits: int
+        Число обращений, для которых результат нашелся в кэше
+
+    misses: int
+        Число обращений, потребовавших вычисления
+    """
+
+    __slots__ = ('max_bytes', 'hits', 'misses', '_entries', '_size')
+
+    def __init__(self, max_bytes: int = GRID_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._size = 0
+
+    def __contains__(self, key) -> bool:
+        return key in self._entries
+
+    @staticmethod
+    def key(*arrays: np.array) -> bytes:
+        digest = hashlib.blake2b(digest_size=16)
+        for array in arrays:
+            array = np.ascontiguousarray(array)
+            digest.update(f'{array.dtype.str}{array.shape};'.encode())
+            digest.update(array.tobytes())
+        return digest.digest()
+
+    def get(self, key):
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return value[0]
+
+    def put(self, key, value):
+        """
+        Сохраняет массив или кортеж массивов, массивы больше
+        max_bytes не сохраняются
+        """
+        arrays = value if isinstance(value, tuple) else (value, )
+        nbytes = sum(array.nbytes for array in arrays)
+        if nbytes > self.max_bytes:
+            return value
+        for array in arrays:
+            array.flags.writeable = False
+        if key in self._entries:
+            self._size -= self._entries.pop(key)[1]
+        self._entries[key] = (value, nbytes)
+        self._size += nbytes
+        while self._size > self.max_bytes:
+            self._size -= self._entries.popitem(last=False)[1][1]
+        return value
+
+    def clear(self):
+        self._entries.clear()
+        self._size = 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Число записей, попаданий, промахов и размер массивов в байтах
+        """
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': self._size
+        }
+
+
+def _vib_chunks(vib_temp: np.array, temperature: np.array, chunk_size: int):
+    # Делит сетку температур на куски, чтобы массив T x моды
+    # не превышал chunk_size элементов
+    step = max(1, chunk_size // max(len(vib_temp), 1))
+    for start in range(0, len(temperature), step):
+        u = vib_temp / temperature[start:start + step, None]
+        yield slice(start, start + step), u, np.expm1(u)
+
+
+def vibrational_enthalpy(vib_temp: np.array,
+                         temperature: np.array,
+                         chunk_size: int = VIB_CHUNK_SIZE,
+                         dtype: np.dtype = np.float64) -> np.array:
+    """
+    Колебательная энтальпия с нулевыми колебаниями
+    Hv = R*∑(θ/(exp(θ/T) - 1) + θ/2) для вектора температур
+
+    Parameters
+    ----------
+    vib_temp: np.array
+        Колебательные температуры мод θ, K
+
+    temperature: np.array
+        Температуры, K
+
+    chunk_size: int
+        Максимальный размер промежуточного массива T x моды
+
+    dtype: np.dtype
+        Точность вычислений и результата, float32 вдвое уменьшает
+        промежуточный массив T x моды
+    """
+    temperature = np.atleast_1d(np.asarray(temperature, dtype=dtype))
+    vib_temp = np.asarray(vib_temp, dtype=dtype)
+    hv = np.empty(len(temperature), dtype=dtype)
+    zpe = 0.5 * vib_temp
+    for chunk, _, expm1 in _vib_chunks(vib_temp, temperature, chunk_size):
+        hv[chunk] = R * np.sum(vib_temp / expm1 + zpe, axis=1)
+    return hv
+
+
+def vibrational_entropy(vib_temp: np.array,
+                        temperature: np.array,
+                        chunk_size: int = VIB_CHUNK_SIZE,
+                        dtype: np.dtype = np.float64) -> np.array:
+    """
+    Колебательная энтропия Sv = R*∑(u/(exp(u) - 1) - ln(1 - exp(-u))),
+    u = θ/T, параметры см. vibrational_enthalpy
+    """
+    temperature = np.atleast_1d(np.asarray(temperature, dtype=dtype))
+    vib_temp = np.asarray(vib_temp, dtype=dtype)
+    sv = np.empty(len(temperature), dtype=dtype)
+    for chunk, u, expm1 in _vib_chunks(vib_temp, temperature, chunk_size):
+        sv[chunk] = R * np.sum(u / expm1 - np.log1p(-np.exp(-u)), axis=1)
+    return sv
+
 
 class Compound:
 
     _ids = count(1)
 
+    # Размер куска сетки для колебательных сумм, см. VIB_CHUNK_SIZE
+    vib_chunk_size = VIB_CHUNK_SIZE
+
+    # Ограничение памяти кэша сеток, см. GridCache
+    grid_cache_bytes = GRID_CACHE_BYTES
+
+    # Точность сеток энергии Гиббса, см. PRECISIONS и gibbs_relative
+    precision = 'float64'
+
+    # Читать и сохранять записи в общем кэше парсинга, см. cache.file_pars
+    use_cache = True
+
     # __slots__ = []
 
     def __init__(self,
                  qm_program: str = 'gaussian',
-                 qm_data: pd.Series = None,
+                 qm_data: ThermoRecord = None,
                  path_to_file: str = None,
                  linear: bool = False,
                  atom: bool = False,
@@ -44,13 +212,15 @@ class Compound:
         self.atom = atom
         self.sn = sn
         self.path_to_file = path_to_file
+        self.grid_cache = GridCache(self.grid_cache_bytes)
 
         if name:
             self.name = name
         else:
             self.name = str(self.id)
 
-        if path_to_file:
+        # Уже разобранному веществу (qm_data) файл не нужен
+        if path_to_file or qm_data is not None:
             self.file = path_to_file
         else:
             _msg = 'compound {} is missing a file'.format(self.name)
@@ -64,23 +234,34 @@ class Compound:
         else:
             self.linear_coefficient = 1.5
 
-        try:
-            if self.qm_program.lower() == 'gaussian':
-                self.qm_data = gauspar.file_pars(self.file)
-            elif self.qm_program.lower() == 'orca':
-                self.qm_data = orpar.file_pars(self.file)
-            else:
-                _msg = f'Failed to load "{self.file}"'
-                # logger.error(_msg)
-                print('This program does not supported in current version\n')
-                # print(PROGRAM_LIST)
-                raise ValueError
-        except Exception as err:
-            _msg = '{} while parsing file {}'.format(repr(err), self.file)
+        if self.qm_program.lower() not in PROGRAM_LIST:
+            _msg = f'Failed to load "{self.file}"'
             # logger.error(_msg)
-            raise err
+            print('This program does not supported in current version\n')
+            # print(PROGRAM_LIST)
+            raise ValueError
+
+        # Файл разбирается при первом обращении к qm_data, freqs
+        # или vib_temp, см. _load
+        self._qm_data = qm_data
+        self._freqs = None
+        self._vib_temp = None
+
+    def _load(self):
+        # Разбор файла квантовохимического расчета и колебательные
+        # температуры, вызывается один раз
+        if self._qm_data is None:
+            try:
+                self._qm_data = cache.file_pars(self.file,
+                                                qm_program=self.qm_program,
+                                                use_cache=self.use_cache)
+            except Exception as err:
+                _msg = '{} while parsing file {}'.format(
+                    repr(err), self.file)
+                # logger.error(_msg)
+                raise err
 
-        if self.qm_data['natoms'] == 2:
+        if self._qm_data.natoms == 2:
 
             if self.linear_coefficient == 1.5:
                 print(f'{self.name}:\n')
@@ -90,24 +271,44 @@ class Compound:
                 _msg = f'{self.name} molecule marked as non-linear, but have only 2 atoms'
                 # logger.warning(_msg)
 
-            # Если молекула 2х атомная, то в ней 1 частота
-            # Нужно чтобы вернуло не 1 значение, а список
-            self.freqs = np.array([self.qm_data['freq.']])
-        elif self.qm_data['atom']:
-            self.freqs = np.array([0])
+        if self._qm_data.atom:
+            self._freqs = np.array([0])
         else:
-            self.freqs = self.qm_data['freq.']
+            self._freqs = self._qm_data.freqs
 
         if not self.atom:
-            self.vib_temp = np.fromiter(
-                map(lambda x: 299792458 / (1 / x / 100) * 4.79924466221135e-11,
-                    self.freqs), np.float64)
+            # θ = c*ν/(kB/h), ν в см-1
+            freqs = np.asarray(self._freqs, dtype=np.float64)
+            self._vib_temp = 299792458 / (1 / freqs / 100) * 4.79924466221135e-11
         else:
             # Если нет частот, то не пытаемся пересчитать
-            self.vib_temp = np.array([0])
+            self._vib_temp = np.array([0])
+
+    @property
+    def loaded(self) -> bool:
+        """Разобран ли уже файл вещества"""
+        return self._vib_temp is not None
+
+    @property
+    def qm_data(self) -> ThermoRecord:
+        if not self.loaded:
+            self._load()
+        return self._qm_data
+
+    @property
+    def freqs(self) -> np.array:
+        if not self.loaded:
+            self._load()
+        return self._freqs
+
+    @property
+    def vib_temp(self) -> np.array:
+        if not self.loaded:
+            self._load()
+        return self._vib_temp
 
     def __repr__(self):
-        return self.path_to_file
+        return self.path_to_file or self.name
 
     @classmethod
     def from_dict(cls, some_dict: dict):
@@ -120,13 +321,26 @@ class Compound:
                    sn=some_dict.get('sn', 1))
 
     @classmethod
-    def from_series(cls, series: pd.Series, name: str, sn: int = 1):
+    def from_series(cls,
+                    series: pd.Series,
+                    name: str,
+                    sn: int = 1,
+                    path_to_file: str = None):
+        """
+        Вещество из pd.Series в формате ThermoRecord.to_series,
+        например из *.csv файла команды parsing:
+
+        >>> series = pd.read_csv('1.csv', index_col=0).iloc[:, 0]
+        >>> Compound.from_series(series, name='A')
+        """
         print('Проверьте правильность данных в таблице\n')
         try:
-            return cls(qm_program=series.get('qm_program', 'gaussian'),
-                       linear=series.get('linear', False),
-                       atom=series.get('atom', False),
-                       qm_data=series,
+            record = ThermoRecord.from_series(series)
+            return cls(qm_program=record.qm_program,
+                       linear=record.linear,
+                       atom=record.atom,
+                       qm_data=record,
+                       path_to_file=path_to_file,
                        name=name,
                        sn=sn)
         except Exception as err:
@@ -135,22 +349,130 @@ class Compound:
             # logger.error(_msg)
             raise err
 
-    def vib_temp_t(self, temperature: np.array) -> np.array:
-        return np.array(list(map(lambda f: f / temperature, self.vib_temp))).T
-
-    def vibrational_enthalpy(self, temperature: np.array,
-                             pressure: np.array) -> np.array:
-        _hvs = map(
-            lambda x: R * np.sum(self.vib_temp / np.expm1(x) + 0.5 * self.
-                                 vib_temp), self.vib_temp_t(temperature))
-
-        df = pd.DataFrame(index=pressure,
-                          columns=temperature,
-                          data=[np.fromiter(_hvs, np.float)] * len(pressure))
+    @classmethod
+    def from_records(cls,
+                     records: Dict[str, ThermoRecord],
+                     compounds: List[dict] = None) -> List['Compound']:
+        """
+        Создает вещества из уже разобранных записей, исходные файлы
+        не читаются.
+
+        Parameters
+        ----------
+        records: Dict[str, ThermoRecord]
+            Записи по путям к файлам, например frame_records(table)
+            или ParseCache.records(paths)
+
+        compounds: List[dict]
+            Описания веществ, как в разделе Compounds yaml файла, запись
+            ищется по path_to_file. По умолчанию создается вещество на
+            каждую запись, имя - имя файла без расширения, linear и atom
+            берутся из записи
+
+        Raises
+        ------
+        KeyError
+            Для вещества из compounds нет записи
+        """
+        if compounds is None:
+            return [
+                cls(qm_program=record.qm_program,
+                    qm_data=record,
+                    path_to_file=path,
+                    linear=record.linear,
+                    atom=record.atom,
+                    name=ntpath.basename(path).split('.')[0])
+                for path, record in records.items()
+            ]
+        # Пути сравниваются в виде ключей кэша парсинга (абсолютные)
+        by_path = {}
+        for path, record in records.items():
+            by_path.setdefault(cache.source_key(str(path)), record)
+        result = []
+        for entry in compounds:
+            path = entry.get('path_to_file')
+            record = by_path.get(cache.source_key(str(path))) if path else None
+            if record is None:
+                raise KeyError(f'{entry.get("name")}: {path} is not parsed')
+            result.append(
+                cls(qm_program=record.qm_program,
+                    qm_data=record,
+                    path_to_file=path,
+                    linear=entry.get('linear', False),
+                    atom=entry.get('atom', False),
+                    name=entry.get('name'),
+                    sn=entry.get('sn', 1)))
+        return result
 
-        return df
+    @classmethod
+    def from_table(cls,
+                   table: Union[str, pd.DataFrame, Sequence[Union[
+                       str, pd.DataFrame]]],
+                   compounds: List[dict] = None) -> List['Compound']:
+        """
+        Создает вещества из таблицы команды parsing -o (*.csv, *.parquet,
+        *.npz) или records_frame. Из таблицы переводятся в записи только
+        строки нужных веществ, см. from_records.
+
+        parsing -o пишет отдельную таблицу для каждой программы, поэтому
+        можно передать список таблиц: они объединяются по ключам кэша
+        парсинга, для файла из нескольких таблиц берется первая строка
+
+        Example
+        -------
+        >>> data = load(open('reactions.yaml'), Loader=Loader)
+        >>> compounds = Compound.from_table(['gaussian.npz', 'orca.npz'],
+        ...                                 data['Compounds'])
+        """
+        if isinstance(table, str):
+            table = read_table(table)
+        elif not isinstance(table, pd.DataFrame):
+            table = pd.concat(
+                [read_table(i) if isinstance(i, str) else i for i in table],
+                sort=False)
+            keys = pd.Index([cache.source_key(str(path))
+                             for path in table.index])
+            table = table[~keys.duplicated()]
+        if compounds is not None:
+            rows = {}
+            for i, path in enumerate(table.index):
+                rows.setdefault(cache.source_key(str(path)), i)
+            wanted = {
+                rows[key]
+                for key in (cache.source_key(str(entry['path_to_file']))
+                            for entry in compounds
+                            if entry.get('path_to_file')) if key in rows
+            }
+            table = table.iloc[sorted(wanted)]
+        return cls.from_records(frame_records(table), compounds)
 
-    def enthalpy(self, temperature: np.array, pressure: np.array) -> np.array:
+    def vib_temp_t(self, temperature: np.array) -> np.array:
+        # Массив θ/T размером температуры x моды
+        return self.vib_temp / np.asarray(temperature)[..., None]
+
+    @staticmethod
+    def _grid(data: np.array, temperature: np.array,
+              pressure: np.array) -> pd.DataFrame:
+        # Граница API: вектор по T или массив P x T превращается
+        # в таблицу с индексом давлений и колонками температур
+        data = np.broadcast_to(data, (len(pressure), len(temperature)))
+        return pd.DataFrame(index=pressure,
+                            columns=temperature,
+                            data=np.array(data))
+
+    @staticmethod
+    def _gibbs_key(temperature: np.array, pressure: np.array,
+                   dtype: np.dtype = np.float64) -> tuple:
+        # В float64 кэшируется полная энергия, в пониженной точности -
+        # энергия относительно E0, ключи у них разные
+        key = GridCache.key(temperature, pressure)
+        dtype = np.dtype(dtype)
+        if dtype == np.float64:
+            return ('gibbs', key)
+        return ('gibbs', dtype.name, key)
+
+    def _enthalpy_t(self, temperature: np.array, reference: float = 0.0,
+                    dtype: np.dtype = np.float64) -> np.array:
         # WORK
         # gaussian
         # Hcorr = Etot + kB*T
@@ -176,40 +498,25 @@ class Compound:
             Hv = 0
             Hr = 0
         else:
-            Hv = self.vibrational_enthalpy(temperature=temperature,
-                                           pressure=pressure)
+            Hv = vibrational_enthalpy(self.vib_temp,
+                                      temperature,
+                                      chunk_size=self.vib_chunk_size,
+                                      dtype=dtype)
 
-        Htot = Ht + Hr + rt + self.qm_data.get('scf energy')
-
-        df = pd.DataFrame(index=pressure,
-                          columns=temperature,
-                          data=[Htot] * len(pressure))
-
-        return df + Hv
-
-    def translation_entropy(self, temperature: np.array,
-                            pressure: np.array) -> np.array:
+        # reference - начало отсчета энергии, см. gibbs_relative
+        return Ht + Hr + rt + (self.qm_data.scf_energy - reference) + Hv
 
+    def _translation_entropy_t(self, temperature: np.array) -> np.array:
         # WORK
         # https://mipt.ru/dbmp/utrapload/566/OXF_3-arphlf42s21.pdf
         # 3.18 eq
         # St = 1.5*R*ln(M) + 2.5*R*ln(T) - R*ln(P) - 9.69
         # M - g/mol, T - K, P - atm
+        # Здесь без -R*ln(P), это единственный член, зависящий от давления
+        return R * (1.5 * np.log(self.qm_data.molecular_mass) +
+                    2.5 * np.log(temperature)) - 9.69
 
-        Ts = np.array(
-            list(
-                map(
-                    lambda p:
-                    (R *
-                     (1.5 * np.log(self.qm_data.get('molecular mass')) + 2.5 *
-                      np.log(temperature) - np.log(p)) - 9.69), pressure)))
-
-        df = pd.DataFrame(index=pressure, columns=temperature, data=Ts)
-
-        return df
-
-    def rotational_entropy(self, temperature: np.array,
-                           pressure: np.array) -> np.array:
+    def _rotational_entropy_t(self, temperature: np.array) -> np.array:
         # WORK
 
         # Sr = R*(ln(qr) + 1.5) for nonlinear molecules
@@ -217,44 +524,15 @@ class Compound:
         # y = (exp(Sr0/R - x)/T0**x)
         # qr = y*T**x
 
-        srot = self.qm_data.get('Rotational entropy')
-
-        # if self.qm_program == 'gaussian':
-        #     srot = self.qm_data.get('Rotational Entropy')
-        # elif self.qm_program == 'orca':
-        #     srot = self.qm_data[f'{self.sn} s(rot)'] / \
-        #         self.qm_data.get('Temperature', 298.15)
-
+        srot = self.qm_data.rotational_entropy
         y = np.exp(srot / R - self.linear_coefficient
-                   ) / self.qm_data['Temperature']**self.linear_coefficient
+                   ) / self.qm_data.temperature**self.linear_coefficient
         qr = y * temperature**self.linear_coefficient
-        index = pressure
-        columns = temperature
-        data = [R * (np.log(qr) + self.linear_coefficient)] * len(pressure)
-
-        try:
-            df = pd.DataFrame(index=index, columns=columns, data=data)
-            return df
-        except Exception as e:
-            error_txt = f'\nError: {e}\n index:{index},\n columns:{columns}\n data:{data}\n'
-            raise Exception(error_txt)
+        return R * (np.log(qr) + self.linear_coefficient)
 
-    def vibrational_entropy(self, temperature: np.array,
-                            pressure: np.array) -> np.array:
-        Ua = self.vib_temp_t(temperature)
-        svib = map(
-            lambda x: R * np.sum((x / np.expm1(x)) - np.log(1 - np.exp(-x))),
-            Ua)
-
-        df = pd.DataFrame(index=pressure,
-                          columns=temperature,
-                          data=[np.fromiter(svib, np.float)] * len(pressure))
-
-        return df
-
-    def total_entropy(self, temperature: np.array,
-                      pressure: np.array) -> np.array:
-        # Stot = St + Sr + Sv + Se
+    def _entropy_t(self, temperature: np.array,
+                   dtype: np.dtype = np.float64) -> np.array:
+        # Stot = St + Sr + Sv + Se при P = 1 атм
 
         # Se = R*LnW - const
 
@@ -263,22 +541,140 @@ class Compound:
             Sv = 0
             Sr = 0
         else:
-            Sr = self.rotational_entropy(temperature=temperature,
-                                         pressure=pressure)
-            Sv = self.vibrational_entropy(temperature=temperature,
-                                          pressure=pressure)
+            Sr = self._rotational_entropy_t(temperature)
+            Sv = vibrational_entropy(self.vib_temp,
+                                     temperature,
+                                     chunk_size=self.vib_chunk_size,
+                                     dtype=dtype)
+
+        return self._translation_entropy_t(temperature) + Sr + Sv + Se
+
+    def thermo_terms(self, temperature: np.array) -> Tuple[np.array, np.array]:
+        """
+        Энтальпия H(T) и энтропия S(T) при давлении 1 атм, векторы
+        по температуре. От давления зависит только поступательная
+        энтропия: S(T, P) = S(T) - R*ln(P). Результат кэшируется
+        в self.grid_cache
+        """
+        temperature = np.atleast_1d(np.asarray(temperature,
+                                               dtype=np.float64))
+        key = ('terms', GridCache.key(temperature))
+        terms = self.grid_cache.get(key)
+        if terms is None:
+            terms = self.grid_cache.put(
+                key, (np.asarray(self._enthalpy_t(temperature),
+                                 dtype=np.float64),
+                      np.asarray(self._entropy_t(temperature),
+                                 dtype=np.float64)))
+        return terms
+
+    def gibbs_array(self, temperature: np.array,
+                    pressure: np.array) -> np.array:
+        """
+        Энергия Гиббса массивом размером давления x температуры:
+        G(T, P) = H(T) - T*S(T) + R*T*ln(P), массив создается один раз.
+        Результат кэшируется в self.grid_cache и доступен только для чтения.
+        При precision = 'float32' в кэше хранится сетка gibbs_relative,
+        а возвращается новый массив float64
+        """
+        temperature = np.atleast_1d(np.asarray(temperature,
+                                               dtype=np.float64))
+        pressure = np.atleast_1d(np.asarray(pressure, dtype=np.float64))
+        if np.dtype(self.precision) != np.float64:
+            reference, gibbs = self.gibbs_relative(temperature, pressure)
+            return gibbs.astype(np.float64) + reference
+        return self._gibbs_float64(temperature, pressure)
+
+    def _gibbs_float64(self, temperature: np.array,
+                       pressure: np.array) -> np.array:
+        # Полная энергия Гиббса в float64, кэшируется
+        key = self._gibbs_key(temperature, pressure)
+        gibbs = self.grid_cache.get(key)
+        if gibbs is None:
+            enthalpy, entropy = self.thermo_terms(temperature)
+            gibbs = self.grid_cache.put(
+                key, (enthalpy - temperature * entropy) +
+                np.multiply.outer(R * np.log(pressure), temperature))
+        return gibbs
+
+    def gibbs_relative(self, temperature: np.array, pressure: np.array,
+                       dtype: np.dtype = None) -> Tuple[float, np.array]:
+        """
+        Энергия Гиббса относительно полной электронной энергии E0:
+        возвращает E0 и массив G(T, P) - E0 (давления x температуры)
+        точности dtype, по умолчанию self.precision.
+
+        В float32 колебательные суммы считаются в одинарной точности,
+        а массив занимает вдвое меньше памяти. Отсчет от E0 нужен потому,
+        что E0 ~ 1e9 Дж/моль, и в float32 от полной энергии осталась бы
+        погрешность порядка сотен Дж/моль. Отклонение от float64 можно
+        оценить с помощью CompoundBatch.deviation. Сетки пониженной
+        точности кэшируются в self.grid_cache
+        """
+        dtype = np.dtype(dtype or self.precision)
+        if dtype.name not in PRECISIONS:
+            raise ValueError(f'precision must be one of {PRECISIONS}, '
+                             f'got {dtype.name}')
+        temperature = np.atleast_1d(np.asarray(temperature,
+                                               dtype=np.float64))
+        pressure = np.atleast_1d(np.asarray(pressure, dtype=np.float64))
+        reference = float(self.qm_data.scf_energy)
+        if dtype == np.float64:
+            return reference, self._gibbs_float64(temperature,
+                                                  pressure) - reference
+        key = self._gibbs_key(temperature, pressure, dtype)
+        gibbs = self.grid_cache.get(key)
+        if gibbs is None:
+            t = temperature.astype(dtype)
+            enthalpy = self._enthalpy_t(t, reference=reference, dtype=dtype)
+            entropy = self._entropy_t(t, dtype=dtype)
+            gibbs = self.grid_cache.put(
+                key, ((enthalpy - t * entropy) + np.multiply.outer(
+                    R * np.log(pressure), temperature)).astype(dtype))
+        return reference, gibbs
+
+    def vibrational_enthalpy(self, temperature: np.array,
+                             pressure: np.array) -> np.array:
+        hv = vibrational_enthalpy(self.vib_temp,
+                                  temperature,
+                                  chunk_size=self.vib_chunk_size)
+        return self._grid(hv, temperature, pressure)
 
-        St = self.translation_entropy(temperature=temperature,
-                                      pressure=pressure)
+    def enthalpy(self, temperature: np.array, pressure: np.array) -> np.array:
+        return self._grid(self._enthalpy_t(temperature), temperature,
+                          pressure)
 
-        return (St + Sr + Sv + Se)
+    def translation_entropy(self, temperature: np.array,
+                            pressure: np.array) -> np.array:
+        st = (self._translation_entropy_t(temperature) -
+              np.multiply.outer(R * np.log(pressure), np.ones_like(
+                  temperature, dtype=np.float64)))
+        return self._grid(st, temperature, pressure)
+
+    def rotational_entropy(self, temperature: np.array,
+                           pressure: np.array) -> np.array:
+        return self._grid(self._rotational_entropy_t(temperature),
+                          temperature, pressure)
+
+    def vibrational_entropy(self, temperature: np.array,
+                            pressure: np.array) -> np.array:
+        sv = vibrational_entropy(self.vib_temp,
+                                 temperature,
+                                 chunk_size=self.vib_chunk_size)
+        return self._grid(sv, temperature, pressure)
+
+    def total_entropy(self, temperature: np.array,
+                      pressure: np.array) -> np.array:
+        stot = (self._entropy_t(temperature) - np.multiply.outer(
+            R * np.log(pressure), np.ones_like(temperature,
+                                               dtype=np.float64)))
+        return self._grid(stot, temperature, pressure)
 
     def gibbs_energy(self, temperature: np.array,
                      pressure: np.array) -> np.array:
-        return self.enthalpy(
-            temperature=temperature,
-            pressure=pressure) - temperature * self.total_entropy(
-                temperature=temperature, pressure=pressure)
+        return self._grid(self.gibbs_array(temperature, pressure),
+                          temperature, pressure)
+
 
 class Reaction:
     def __init__(self,
@@ -305,6 +701,17 @@ class Reaction:
         self.reaction_dict = self.reaction_pars(reaction=self.reaction,
                                                 compounds=self.compounds)
 
+    @staticmethod
+    def compound_names(reaction: str) -> List[str]:
+        """
+        Имена веществ в строке реакции вида '2*A + 3*C = D'
+        """
+        return [
+            compound.split('*')[-1].strip()
+            for element in reaction.split('=')
+            for compound in element.split('+')
+        ]
+
     def reaction_pars(self, reaction: str, compounds: List[Compound]
                       ) -> List[Dict[str, Tuple[float, Compound]]]:
         # element[0] - reagents, elements[1] - products
@@ -369,11 +776,17 @@ class Reaction_COSMO(Reaction):
                  name: str = None,
                  ideal: list = None):
 
-        self.settings = Jobs(cosmo).settings_df()
-        self.cdata = Jobs(cosmo).small_df(invert=1,
-                                          columns=('Gsolv', 'ln(gamma)', 'Nr'))
+        registry = default_registry()
+        self.settings_table = registry.settings_table(cosmo)
+        self.settings = self.settings_table.settings_df()
+        self.cdata = registry.compound_index(cosmo)
+        # Настройки в порядке работ индекса веществ
+        order = pd.Index(self.settings_table.jobs).get_indexer(
+            self.cdata.jobs)
+        self._settings_values = self.settings_table.values[order]
+        self._temperature = self._setting('T=')
         p = np.array([1])
-        t = self.settings.loc['T='].to_numpy()
+        t = self.settings_table.column('T=')
         self.condition = {'temperature': t, 'pressure': p}
         super().__init__(reaction=reaction,
                          compounds=compounds,
@@ -386,43 +799,42 @@ class Reaction_COSMO(Reaction):
         else:
             self.ideal = []
 
+    def _setting(self, name: str) -> np.ndarray:
+        return self._settings_values[:, self.settings_table.names.index(name)]
+
     def _rtln_half_reaction(self,
                             half_reaction: Dict[str, Tuple[float, Compound]]):
-        _ = []
+        rtln = np.zeros(len(self.cdata.jobs))
         for compound in half_reaction.keys():
             # Reaction coefficient
             comp_coef = half_reaction[compound][0]
+            row = self.cdata.row(compound)
             # Compound number in tab file
-            comp_nr = self.cdata.loc[compound]['Nr'].iloc[0]
+            comp_nr = str(self.cdata.nr[row])
             # Concentration, = 1 if compound not in setting table
-            if compound in self.ideal:
-                comp_x = 1
+            # or its concentration is not set in a job
+            if (compound in self.ideal
+                    or comp_nr not in self.settings_table.names):
+                lnx = 0
             else:
-                comp_x = self.settings.loc[str(comp_nr)] if str(
-                    comp_nr) in self.settings.index.values.tolist() else 1
+                comp_x = self._setting(comp_nr).copy()
+                comp_x[np.isnan(comp_x) | (comp_x == 0)] = 1
+                lnx = np.log(comp_x)
 
-            if not isinstance(comp_x, (int, float)):
-                comp_x.replace(0, 1, inplace=True)
-            else:
-                pass
-
-            lnx = np.log(comp_x)
-            comp_rtln = self.settings.loc['T='] * R * (lnx + self.cdata.loc[
-                compound]['ln(gamma)'])
-            _.append(comp_coef * comp_rtln)
+            rtln += comp_coef * (self._temperature * R *
+                                 (lnx + self.cdata.lngamma[row]))
 
-        return sum(_)
+        return pd.Series(rtln, index=pd.Index(self.cdata.jobs, name='Job'))
 
     def _gsolv_half_reaction(self,
                              half_reaction: Dict[str, Tuple[float, Compound]]):
         # !!! Cospar return original values from tab files, so i
         # multiply Gsolv 4184 to turn it in J/mol !!!
-        return sum(
-            map(
-                lambda compound: half_reaction[compound][0] * self.cdata.loc[
-                    half_reaction[compound][1].name]['Gsolv'] * 4184,
-                half_reaction.keys())) + self._rtln_half_reaction(
-                    half_reaction=half_reaction)
+        gsolv = np.zeros(len(self.cdata.jobs))
+        for coef, compound in half_reaction.values():
+            row = self.cdata.row(compound.name)
+            gsolv += coef * self.cdata.gsolv[row] * 4184
+        return gsolv + self._rtln_half_reaction(half_reaction=half_reaction)
 
     def gtot(self):
         reaction_dict = self.reaction_pars(reaction=self.reaction,
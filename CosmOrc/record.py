@@ -0,0 +1,370 @@
+import math
+import os
+from typing import Any, Dict, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from CosmOrc.setting import Setting
+
+# Имена полей записи и соответствующие им имена параметров
+# в pd.Series, которую возвращали file_pars
+FIELDS = (
+    ('scf_energy', 'scf energy'),
+    ('molecular_mass', 'molecular mass'),
+    ('temperature', 'Temperature'),
+    ('pressure', 'Pressure'),
+    ('deg_of_freedom', 'deg. of freedom'),
+    ('electronic_entropy', 'Electronic entropy'),
+    ('translational_entropy', 'Translational entropy'),
+    ('rotational_entropy', 'Rotational entropy'),
+    ('vibrational_entropy', 'Vibrational entropy'),
+)
+
+_FIELD_BY_NAME = {name: field for field, name in FIELDS}
+
+
+class ThermoRecord:
+    """
+    Результат парсинга одного выходного файла квантово-химической
+    программы. Скалярные величины хранятся в типизированных полях,
+    частоты - в одном массиве float64. В pd.Series запись переводится
+    только по запросу (to_series).
+
+    Attributes
+    ----------
+    qm_program: str
+        'gaussian' или 'orca'
+
+    natoms: int
+        Число атомов
+
+    freqs: np.ndarray
+        Частоты в cm**-1
+
+    scf_energy, molecular_mass, temperature, pressure, deg_of_freedom: float
+        Электронная энергия в J/mol, масса в amu, температура и давление
+        расчета термохимии, число степеней свободы
+
+    electronic_entropy, translational_entropy, rotational_entropy,
+    vibrational_entropy: float
+        Вклады в энтропию в J/mol*K
+
+    point_group: str
+        Точечная группа (только Gaussian)
+
+    atom, linear: bool
+        Частица - атом, линейная молекула
+
+    extra: Dict[str, float]
+        Остальные параметры файла под их исходными именами
+
+    Отсутствующие в файле величины хранятся как NaN
+    """
+
+    __slots__ = ('qm_program', 'natoms', 'freqs', 'point_group', 'atom',
+                 'linear', 'extra') + tuple(field for field, _ in FIELDS)
+
+    def __init__(self,
+                 qm_program: str,
+                 natoms: int,
+                 freqs: Iterable[float] = (),
+                 point_group: str = None,
+                 atom: bool = None,
+                 linear: bool = None,
+                 extra: Dict[str, float] = None,
+                 **fields: float):
+        self.qm_program = qm_program
+        self.natoms = int(natoms)
+        self.freqs = np.asarray(freqs, dtype=np.float64).reshape(-1)
+        self.point_group = point_group
+        self.extra = dict(extra) if extra else {}
+        for field, _ in FIELDS:
+            setattr(self, field, float(fields.pop(field, math.nan)))
+        if fields:
+            raise TypeError(f'unexpected fields: {", ".join(fields)}')
+
+        if atom is None:
+            atom = self.natoms == 1
+        self.atom = bool(atom)
+        if linear is None:
+            linear = self.atom or self.deg_of_freedom == 1 or (
+                self.natoms > 1 and self.natoms * 3 - 5 == len(self.freqs))
+        self.linear = bool(linear)
+
+    @classmethod
+    def from_settings(cls,
+                      settings: Iterable[Setting],
+                      freqs: Iterable[float],
+                      qm_program: str,
+                      point_group: str = None):
+        """
+        Собирает запись из объектов Setting, полученных парсерами.
+        Если параметр встречается несколько раз, остается последнее значение
+        """
+        fields: Dict[str, float] = {}
+        extra: Dict[str, float] = {}
+        natoms = None
+        for setting in settings:
+            if setting.name == 'natoms':
+                natoms = setting.value
+            elif setting.name in _FIELD_BY_NAME:
+                fields[_FIELD_BY_NAME[setting.name]] = setting.value
+            else:
+                extra[setting.name] = setting.value
+        if natoms is None:
+            raise ValueError('number of atoms is missing')
+        return cls(qm_program=qm_program,
+                   natoms=natoms,
+                   freqs=freqs,
+                   point_group=point_group,
+                   extra=extra,
+                   **fields)
+
+    @classmethod
+    def from_series(cls, series: pd.Series):
+        """
+        Собирает запись из pd.Series в формате to_series,
+        например из *.csv файла команды parsing
+        """
+        fields: Dict[str, float] = {}
+        extra: Dict[str, float] = {}
+        for name, value in zip(series.index, series.tolist()):
+            if name in _FIELD_BY_NAME:
+                fields[_FIELD_BY_NAME[name]] = value
+            elif name not in ('freq.', 'natoms', 'full point group',
+                              'qm_program', 'atom', 'linear'):
+                extra[name] = float(value)
+        point_group = series.get('full point group')
+        if isinstance(point_group, float) and math.isnan(point_group):
+            point_group = None
+        freqs = series.loc[series.index == 'freq.']
+        return cls(qm_program=series.get('qm_program', 'gaussian'),
+                   natoms=float(series['natoms']),
+                   freqs=np.asarray(freqs, dtype=np.float64),
+                   point_group=point_group,
+                   atom=_to_bool(series.get('atom')),
+                   linear=_to_bool(series.get('linear')),
+                   extra=extra,
+                   **fields)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Словарь из стандартных типов python (для json)
+        """
+        data = {
+            field: getattr(self, field)
+            for field in self.__slots__ if field != 'freqs'
+        }
+        data['freqs'] = self.freqs.tolist()
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]):
+        return cls(**data)
+
+    def get(self, name: str, default: Any = None) -> Any:
+        """
+        Доступ к значению по имени параметра из pd.Series (см. FIELDS),
+        неизвестные значения возвращаются как default
+        """
+        if name in _FIELD_BY_NAME:
+            value = getattr(self, _FIELD_BY_NAME[name])
+        elif name == 'natoms':
+            value = self.natoms
+        else:
+            value = self.extra.get(name, default)
+        if isinstance(value, float) and math.isnan(value):
+            return default
+        return value
+
+    def to_series(self) -> pd.Series:
+        """
+        pd.Series в формате, который раньше возвращали file_pars:
+        каждая частота записана под индексом 'freq.'
+        """
+        index = ['freq.'] * len(self.freqs)
+        data = self.freqs.tolist()
+        for field, name in FIELDS:
+            value = getattr(self, field)
+            if not math.isnan(value):
+                index.append(name)
+                data.append(value)
+        index.extend(self.extra)
+        data.extend(self.extra.values())
+        index.append('natoms')
+        data.append(float(self.natoms))
+        if self.point_group is not None:
+            index.append('full point group')
+            data.append(self.point_group)
+        index.extend(('qm_program', 'atom', 'linear'))
+        data.extend((self.qm_program, self.atom, self.linear))
+        return pd.Series(data=data, index=index, name='parameters')
+
+    def to_frame(self, name: Optional[str] = None) -> pd.DataFrame:
+        """
+        Однострочный pd.DataFrame со скалярными полями, параметрами
+        из extra и массивом частот в одной ячейке
+        """
+        row = self.to_dict()
+        row.update(row.pop('extra'))
+        row['freqs'] = self.freqs
+        return pd.DataFrame(data=[row], index=[name])
+
+    def __repr__(self):
+        return '{} {} atoms, {} freqs, scf energy {} J/mol'.format(
+            self.qm_program, self.natoms, len(self.freqs), self.scf_energy)
+
+
+def _to_bool(value: Any) -> Optional[bool]:
+    # В *.csv булевы значения записываются строками
+    if value is None or isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        return value.strip().lower() == 'true'
+    return bool(value)
+
+
+# Столбцы таблицы записей, кроме параметров из extra и частот
+RECORD_COLUMNS = ('qm_program', 'natoms', 'point_group', 'atom',
+                  'linear') + tuple(field for field, _ in FIELDS)
+
+TABLE_FORMATS = ('.csv', '.parquet', '.npz')
+
+
+def records_frame(records: Dict[str, ThermoRecord]) -> pd.DataFrame:
+    """
+    Собирает одну таблицу из записей: одна строка на файл, скалярные
+    величины и параметры из extra в отдельных столбцах, частоты -
+    массивом разной длины в столбце 'freqs'
+
+    Parameters
+    ----------
+    records: Dict[str, ThermoRecord]
+        Записи, ключи становятся индексом таблицы
+    """
+    columns = {
+        column: [getattr(record, column) for record in records.values()]
+        for column in RECORD_COLUMNS
+    }
+    extra_names: Dict[str, None] = {}
+    for record in records.values():
+        extra_names.update(dict.fromkeys(record.extra))
+    for name in extra_names:
+        columns[name] = [
+            record.extra.get(name, math.nan) for record in records.values()
+        ]
+    frame = pd.DataFrame(columns, index=pd.Index(list(records), name='file'))
+    # Поэлементное присваивание, иначе numpy склеит массивы
+    # одинаковой длины в двумерный массив
+    frame['freqs'] = _object_column(
+        [record.freqs for record in records.values()])
+    return frame
+
+
+def frame_records(frame: pd.DataFrame) -> Dict[str, ThermoRecord]:
+    """
+    Обратное преобразование records_frame
+    """
+    extra_names = [
+        column for column in frame.columns
+        if column not in RECORD_COLUMNS and column != 'freqs'
+    ]
+    records = {}
+    for name, row in zip(frame.index, frame.to_dict('records')):
+        point_group = row['point_group']
+        if not isinstance(point_group, str) or not point_group:
+            point_group = None
+        extra = {
+            column: row[column]
+            for column in extra_names if not pd.isnull(row[column])
+        }
+        records[name] = ThermoRecord(
+            qm_program=row['qm_program'],
+            natoms=row['natoms'],
+            freqs=row['freqs'],
+            point_group=point_group,
+            atom=_to_bool(row['atom']),
+            linear=_to_bool(row['linear']),
+            extra=extra,
+            **{field: row[field]
+               for field, _ in FIELDS})
+    return records
+
+
+def write_table(frame: pd.DataFrame, path: str):
+    """
+    Записывает таблицу records_frame в *.csv, *.parquet или *.npz файл.
+    В *.csv частоты записываются строкой через пробел, в *.npz - одним
+    массивом 'freqs' и смещениями 'freq_offsets' (CSR)
+    """
+    suffix = os.path.splitext(path)[1].lower()
+    if suffix == '.csv':
+        frame = frame.copy()
+        frame['freqs'] = [
+            ' '.join(map(repr, freqs.tolist())) for freqs in frame['freqs']
+        ]
+        frame.to_csv(path, header=True)
+    elif suffix == '.parquet':
+        frame = frame.copy()
+        frame['freqs'] = [freqs.tolist() for freqs in frame['freqs']]
+        frame.to_parquet(path)
+    elif suffix == '.npz':
+        freqs = list(frame['freqs'])
+        arrays = {
+            column: frame[column].to_numpy()
+            for column in frame.columns if column != 'freqs'
+        }
+        arrays['point_group'] = frame['point_group'].fillna('').to_numpy(
+            dtype=str)
+        arrays['qm_program'] = frame['qm_program'].to_numpy(dtype=str)
+        arrays['file_name'] = frame.index.to_numpy(dtype=str)
+        arrays['freqs'] = (np.concatenate(freqs)
+                           if freqs else np.empty(0, dtype=np.float64))
+        arrays['freq_offsets'] = np.cumsum([0] + [len(x) for x in freqs])
+        np.savez(path, **arrays)
+    else:
+        raise ValueError(
+            f'unknown table format {suffix}, use one of {TABLE_FORMATS}')
+
+
+def read_table(path: str) -> pd.DataFrame:
+    """
+    Читает таблицу, записанную write_table
+    """
+    suffix = os.path.splitext(path)[1].lower()
+    if suffix == '.csv':
+        frame = pd.read_csv(path, index_col=0, float_precision='round_trip')
+        frame['freqs'] = _object_column([
+            np.array(freqs.split(), dtype=np.float64)
+            if isinstance(freqs, str) else np.empty(0, dtype=np.float64)
+            for freqs in frame['freqs']
+        ])
+    elif suffix == '.parquet':
+        frame = pd.read_parquet(path)
+        frame['freqs'] = _object_column(
+            [np.asarray(freqs, dtype=np.float64) for freqs in frame['freqs']])
+    elif suffix == '.npz':
+        with np.load(path) as data:
+            offsets = data['freq_offsets']
+            freqs = np.split(data['freqs'], offsets[1:-1])
+            columns = [
+                name for name in data.files
+                if name not in ('file_name', 'freqs', 'freq_offsets')
+            ]
+            index = pd.Index(data['file_name'], name='file')
+            frame = pd.DataFrame({name: data[name]
+                                  for name in columns},
+                                 index=index)
+        frame['freqs'] = _object_column(freqs)
+    else:
+        raise ValueError(
+            f'unknown table format {suffix}, use one of {TABLE_FORMATS}')
+    return frame
+
+
+def _object_column(arrays) -> np.ndarray:
+    column = np.empty(len(arrays), dtype=object)
+    for i, array in enumerate(arrays):
+        column[i] = array
+    return column
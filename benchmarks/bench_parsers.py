@@ -0,0 +1,97 @@
+"""
+Бенчмарк парсеров gauspar, orpar и cospar на синтетических файлах.
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.bench_parsers --files 20 --natoms 200 --jobs 2000
+
+Для каждого парсера печатается число файлов в секунду, MB/s и пиковая
+память (tracemalloc, только выделения Python и numpy).
+"""
+import os
+import tempfile
+import time
+import tracemalloc
+
+import click
+
+import CosmOrc.gauspar as gauspar
+import CosmOrc.orpar as orpar
+from CosmOrc.cospar import Jobs
+
+from benchmarks.corpus import write_corpus
+
+
+def measure(parser, paths, repeat=1):
+    """
+    Запускает parser на всех файлах repeat раз и возвращает
+    (files/s, MB/s, пиковая память в MB) для лучшего прогона.
+    Память измеряется отдельным прогоном, tracemalloc сильно
+    замедляет выделение памяти и искажает время
+    """
+    size = sum(os.path.getsize(path) for path in paths) / 2**20
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for path in paths:
+            parser(path)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    for path in paths:
+        parser(path)
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return len(paths) / best, size / best, peak
+
+
+BENCHMARKS = (
+    ('gauspar.file_pars', 'gaussian', gauspar.file_pars),
+    ('gauspar.file_pars(tail)', 'gaussian',
+     lambda path: gauspar.file_pars(path, tail=True)),
+    ('orpar.file_pars', 'orca', orpar.file_pars),
+    ('cospar.Jobs', 'cosmo', Jobs),
+)
+
+
+@click.command()
+@click.option('--files', default=10, show_default=True,
+              help='Number of files of each kind')
+@click.option('--natoms', default=100, show_default=True,
+              help='Atoms in gaussian and orca outputs, 3N-6 frequencies')
+@click.option('--opt-steps', default=100, show_default=True,
+              help='Geometry optimisation steps in gaussian and orca outputs')
+@click.option('--jobs', default=1000, show_default=True,
+              help='Jobs in each COSMOtherm tab file')
+@click.option('--compounds', default=20, show_default=True,
+              help='Compounds in each COSMOtherm job')
+@click.option('--repeat', default=3, show_default=True,
+              help='Repeats, the best time is reported')
+@click.option('-k', '--only', multiple=True,
+              help='Run only benchmarks containing this substring')
+@click.option('--keep', type=click.Path(file_okay=False), default=None,
+              help='Write the corpus to this directory and keep it')
+def main(files, natoms, opt_steps, jobs, compounds, repeat, only, keep):
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = keep or tmp
+        corpus = {
+            'gaussian': write_corpus(directory, 'gaussian', files,
+                                     natoms=natoms, opt_steps=opt_steps),
+            'orca': write_corpus(directory, 'orca', files,
+                                 natoms=natoms, opt_steps=opt_steps),
+            'cosmo': write_corpus(directory, 'cosmo', files,
+                                  jobs=jobs, compounds=compounds),
+        }
+        click.echo(f'{"benchmark":<26}{"MB":>9}{"files/s":>11}{"MB/s":>10}'
+                   f'{"peak MB":>10}')
+        for name, kind, parser in BENCHMARKS:
+            if only and not any(key in name for key in only):
+                continue
+            paths = corpus[kind]
+            size = sum(os.path.getsize(path) for path in paths) / 2**20
+            files_s, mb_s, peak = measure(parser, paths, repeat=repeat)
+            click.echo(f'{name:<26}{size:9.1f}{files_s:11.2f}{mb_s:10.2f}'
+                       f'{peak:10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,276 @@
+"""
+Генераторы синтетических выходных файлов Gaussian, ORCA и *.tab файлов
+COSMOtherm для бенчмарков парсеров. Файлы повторяют структуру настоящих
+выходных файлов (длинная оптимизация, блок частот, термохимия, много
+работ в *.tab файле), но числа в них случайные.
+"""
+import os
+import random
+from typing import List
+
+ELEMENTS = ((1, 'H', 1.008), (6, 'C', 12.011), (7, 'N', 14.007),
+            (8, 'O', 15.999))
+
+
+def _atoms(rng: random.Random, natoms: int):
+    return [rng.choice(ELEMENTS) for _ in range(natoms)]
+
+
+def _coordinates(rng: random.Random, natoms: int):
+    return [(rng.uniform(-5, 5), rng.uniform(-5, 5), rng.uniform(-5, 5))
+            for _ in range(natoms)]
+
+
+def _frequencies(rng: random.Random, natoms: int, linear: bool = False):
+    nfreq = 3 * natoms - (5 if linear else 6)
+    return sorted(rng.uniform(30, 3500) for _ in range(max(nfreq, 1)))
+
+
+def gaussian_log(natoms: int = 20, opt_steps: int = 50, seed: int = 0) -> str:
+    """
+    Лог Gaussian 'opt freq': opt_steps шагов оптимизации, затем --Link1--
+    шаг с частотами и термохимией
+
+    Parameters
+    ----------
+    natoms: int
+        Число атомов, частот будет 3 * natoms - 6
+
+    opt_steps: int
+        Число шагов оптимизации
+
+    seed: int
+        Зерно генератора случайных чисел
+    """
+    rng = random.Random(seed)
+    atoms = _atoms(rng, natoms)
+    mass = sum(atom[2] for atom in atoms)
+    dashes = ' ' + '-' * 69 + '\n'
+    lines = [
+        ' Entering Gaussian System, Link 0=g16\n', dashes,
+        ' #p opt freq b3lyp/6-31g(d)\n', dashes,
+        f' NAtoms= {natoms:6d} NQM= {natoms:8d} NQMF=       0 NMic=       0'
+        f' NMicF=      0 NTot= {natoms:7d}.\n'
+    ]
+
+    def geometry(energy):
+        block = [
+            dashes, '                          Input orientation:\n', dashes,
+            ' Center     Atomic      Atomic             Coordinates '
+            '(Angstroms)\n',
+            ' Number     Number       Type             X           Y'
+            '           Z\n', dashes
+        ]
+        for i, ((number, _, _), xyz) in enumerate(
+                zip(atoms, _coordinates(rng, natoms)), 1):
+            block.append(f' {i:6d} {number:10d} {0:11d} {xyz[0]:15.6f}'
+                         f'{xyz[1]:12.6f}{xyz[2]:12.6f}\n')
+        block.append(dashes)
+        block.append(' Rotational constants (GHZ):'
+                     f'{rng.uniform(0.1, 5):16.7f}{rng.uniform(0.1, 5):16.7f}'
+                     f'{rng.uniform(0.1, 5):16.7f}\n')
+        block.append(f' SCF Done:  E(RB3LYP) = {energy:17.10f}     A.U. after'
+                     f' {rng.randint(5, 20):4d} cycles\n')
+        block.append(' Full point group                 C1      NOp   1\n')
+        return block
+
+    energy = -40.0 * natoms
+    for _ in range(opt_steps):
+        energy -= rng.uniform(0, 1e-3)
+        lines.extend(geometry(energy))
+        lines.append(f' Deg. of freedom {3 * natoms - 6:5d}\n')
+        lines.append(' Center     Atomic                   Forces '
+                     '(Hartrees/Bohr)\n')
+        for i, (number, _, _) in enumerate(atoms, 1):
+            lines.append(f' {i:6d} {number:8d} {rng.uniform(-1e-3, 1e-3):18.9f}'
+                         f'{rng.uniform(-1e-3, 1e-3):15.9f}'
+                         f'{rng.uniform(-1e-3, 1e-3):15.9f}\n')
+        lines.append('         Item               Value     Threshold  '
+                     'Converged?\n')
+        lines.append(f' Maximum Force            {rng.uniform(0, 1e-3):.6f}'
+                     '     0.000450     NO\n')
+
+    lines.extend([
+        ' Link1:  Proceeding to internal job step number  2.\n', dashes,
+        ' #P Geom=AllCheck Guess=TCheck SCRF=Check GenChk RB3LYP/6-31G(d)'
+        ' Freq\n', dashes, lines[4]
+    ])
+    lines.extend(geometry(energy))
+    lines.append(f' Deg. of freedom {3 * natoms - 6:5d}\n')
+    lines.append(' Harmonic frequencies (cm**-1), IR intensities (KM/Mole),'
+                 ' Raman scattering\n')
+    freqs = _frequencies(rng, natoms)
+    for start in range(0, len(freqs), 3):
+        group = freqs[start:start + 3]
+        lines.append(' ' + ''.join(f'{i:22d}' for i in range(
+            start + 1, start + 1 + len(group))) + '\n')
+        lines.append(' ' + ''.join(f'{"A":>22}' for _ in group) + '\n')
+        lines.append(' Frequencies --' + ''.join(f'{x:23.4f}'
+                                                 for x in group) + '\n')
+        lines.append(' Red. masses --' + ''.join(
+            f'{rng.uniform(1, 10):23.4f}' for _ in group) + '\n')
+        lines.append(' IR Inten    --' + ''.join(
+            f'{rng.uniform(0, 100):23.4f}' for _ in group) + '\n')
+        lines.append('  Atom  AN      X      Y      Z  ' * len(group) + '\n')
+        for i, (number, _, _) in enumerate(atoms, 1):
+            lines.append(f'{i:6d}{number:4d}' + ''.join(
+                f'  {rng.uniform(-1, 1):5.2f}  {rng.uniform(-1, 1):5.2f}'
+                f'  {rng.uniform(-1, 1):5.2f}' for _ in group) + '\n')
+
+    lines.extend([
+        ' - Thermochemistry -\n',
+        ' Temperature   298.150 Kelvin.  Pressure   1.00000 Atm.\n',
+        f' Molecular mass: {mass:12.5f} amu.\n',
+        ' Rotational symmetry number  1.\n',
+        ' Zero-point correction=                           0.245018 '
+        '(Hartree/Particle)\n',
+        ' Thermal correction to Energy=                    0.257884\n',
+        ' Thermal correction to Enthalpy=                  0.258828\n',
+        ' Thermal correction to Gibbs Free Energy=         0.207698\n',
+        f' Sum of electronic and zero-point Energies= {energy + 0.245:21.6f}\n',
+        f' Sum of electronic and thermal Energies= {energy + 0.257:24.6f}\n',
+        f' Sum of electronic and thermal Enthalpies= {energy + 0.258:22.6f}\n',
+        f' Sum of electronic and thermal Free Energies= {energy + 0.207:19.6f}'
+        '\n',
+        '                     E (Thermal)             CV                S\n',
+        '                      KCal/Mol        Cal/Mol-Kelvin    '
+        'Cal/Mol-Kelvin\n',
+        ' Total                  162.043             46.447            '
+        '124.468\n',
+        ' Electronic               0.000              0.000              '
+        '0.000\n',
+        ' Translational            0.889              2.981             '
+        '41.261\n',
+        ' Rotational               0.889              2.981             '
+        '31.114\n',
+        ' Vibrational            160.266             40.485             '
+        '52.093\n',
+        ' Normal termination of Gaussian 16\n'
+    ])
+    return ''.join(lines)
+
+
+def orca_output(natoms: int = 20, opt_steps: int = 50, seed: int = 0) -> str:
+    """
+    Выходной файл ORCA: оптимизация геометрии, частоты и термохимия,
+    параметры см. gaussian_log
+    """
+    rng = random.Random(seed)
+    atoms = _atoms(rng, natoms)
+    mass = sum(atom[2] for atom in atoms)
+    lines = [
+        '                                 * O   R   C   A *\n',
+        f'Number of atoms                             ... {natoms:6d}\n',
+        f'Number of degrees of freedom                ... {3 * natoms:6d}\n'
+    ]
+    energy = -40.0 * natoms
+    for step in range(1, opt_steps + 1):
+        energy -= rng.uniform(0, 1e-3)
+        lines.append('---------------------------------\n')
+        lines.append('CARTESIAN COORDINATES (ANGSTROEM)\n')
+        lines.append('---------------------------------\n')
+        for (_, symbol, _), xyz in zip(atoms, _coordinates(rng, natoms)):
+            lines.append(f'  {symbol:<3}{xyz[0]:15.6f}{xyz[1]:15.6f}'
+                         f'{xyz[2]:15.6f}\n')
+        lines.append(f'FINAL SINGLE POINT ENERGY {energy:22.12f}\n')
+        lines.append(f'                   *   GEOMETRY OPTIMIZATION CYCLE '
+                     f'{step:3d}   *\n')
+
+    lines.extend([
+        '-----------------------\n', 'VIBRATIONAL FREQUENCIES\n',
+        '-----------------------\n'
+    ])
+    freqs = [0.0] * 6 + _frequencies(rng, natoms)
+    for i, freq in enumerate(freqs):
+        lines.append(f'{i:5d}: {freq:12.2f} cm**-1\n')
+
+    tsrot = rng.uniform(3, 6)
+    lines.extend([
+        '--------------------------\n', 'THERMOCHEMISTRY AT 298.15K\n',
+        '--------------------------\n',
+        'Temperature         ...   298.15 K\n',
+        'Pressure            ...     1.00 atm\n',
+        f'Total Mass          ... {mass:8.2f} AMU\n',
+        f'Electronic energy                ... {energy:15.8f} Eh\n',
+        'Zero point energy                ...      0.24460617 Eh'
+        '     153.49 kcal/mol\n',
+        'Thermal vibrational correction   ...      0.00810429 Eh'
+        '       5.09 kcal/mol\n',
+        'Thermal rotational correction    ...      0.00141627 Eh'
+        '       0.89 kcal/mol\n',
+        'Thermal translational correction ...      0.00141627 Eh'
+        '       0.89 kcal/mol\n',
+        'Thermal Enthalpy correction       ...      0.00094421 Eh'
+        '       0.59 kcal/mol\n',
+        f'Total enthalpy                    ... {energy + 0.257:15.8f} Eh\n',
+        'Electronic entropy                ...      0.00000000 Eh'
+        '      0.00 kcal/mol\n',
+        'Vibrational entropy               ...      0.01414000 Eh'
+        '      8.87 kcal/mol\n',
+        'Rotational entropy                ...      0.01481000 Eh'
+        '      9.29 kcal/mol\n',
+        'Translational entropy             ...      0.01927000 Eh'
+        '     12.09 kcal/mol\n',
+        f' sn= 1  qrot.sn= {rng.uniform(1e3, 1e5):12.2f} T*S(rot)= '
+        f'{tsrot:8.2f} kcal/mol T*S(tot)= {tsrot + 21:8.2f} kcal/mol\n',
+        f'Final Gibbs free enthalpy         ... {energy + 0.207:15.8f} Eh\n',
+        '                             ****ORCA TERMINATED NORMALLY****\n'
+    ])
+    return ''.join(lines)
+
+
+def cosmo_tab(jobs: int = 1000, compounds: int = 20, seed: int = 0) -> str:
+    """
+    *.tab файл COSMOtherm: jobs работ (скан по концентрациям
+    и температуре), в каждой таблица из compounds веществ
+    """
+    rng = random.Random(seed)
+    names = [f'cosmo{i}' for i in range(1, compounds + 1)]
+    header = ('  Nr Compound           H        ln(gamma)     pv          '
+              'Gsolv       pvExp     HpvExp     GpvExp\n')
+    lines = []
+    for job in range(1, jobs + 1):
+        temperature = 250 + 5 * (job % 30)
+        x1 = rng.uniform(0, 1)
+        lines.append(f'Property  job {job:d} : Henry Law Coefficient ;\n')
+        lines.append(f'Settings  job {job:d} : T= {temperature:.2f} K ; '
+                     f'x(1)= {x1:.4f} x(2)= {1 - x1:.4f} ;\n')
+        lines.append(f'Units  job {job:d} : H in [bar]; Gsolv in [kcal/mol]'
+                     ' ;\n')
+        lines.append(header)
+        for nr, name in enumerate(names, 1):
+            lines.append(
+                f'{nr:4d} {name:<12} {rng.uniform(1e-40, 1e-5):12.4E} '
+                f'{rng.uniform(-6, 4):12.8f} {rng.uniform(1e-40, 1e-5):12.4E} '
+                f'{rng.uniform(-50, -5):12.8f}         NA         NA'
+                '         NA\n')
+        lines.append('\n')
+    return ''.join(lines)
+
+
+GENERATORS = {
+    'gaussian': (gaussian_log, '.log'),
+    'orca': (orca_output, '.out'),
+    'cosmo': (cosmo_tab, '.tab'),
+}
+
+
+def write_corpus(directory: str, kind: str, files: int, **sizes) -> List[str]:
+    """
+    Записывает files синтетических файлов типа kind
+    ('gaussian', 'orca' или 'cosmo') в directory
+
+    Returns
+    -------
+    paths: List[str]
+        Пути к созданным файлам
+    """
+    generator, suffix = GENERATORS[kind]
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for seed in range(files):
+        path = os.path.join(directory, f'{kind}_{seed}{suffix}')
+        with open(path, 'w') as data_file:
+            data_file.write(generator(seed=seed, **sizes))
+        paths.append(path)
+    return paths
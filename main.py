@@ -1,14 +1,21 @@
 import ntpath
 import os
+from concurrent.futures import (FIRST_COMPLETED, ProcessPoolExecutor,
+                                as_completed, wait)
+from functools import partial
+from itertools import chain
 
 import click
 import numpy as np
 import pandas as pd
 from yaml import dump, load
 
-import CosmOrc.gauspar as gauspar
-import CosmOrc.orpar as orpar
-from CosmOrc.cospar import Jobs
+import CosmOrc.archive as archive
+import CosmOrc.cache as cache
+from CosmOrc.batch import CompoundBatch
+from CosmOrc.cospar import convert_tab
+from CosmOrc.network import ReactionNetwork
+from CosmOrc.record import TABLE_FORMATS, records_frame, write_table
 from CosmOrc.reactions import Compound, Reaction, Reaction_COSMO
 from CosmOrc.generator import Cosmo_Generator
 
@@ -24,11 +31,93 @@ def condition_pars(cond_str):
 
 
 def cosmo_parsing(path, parameters=('Gsolv', 'ln(gamma)', 'Nr')):
-    new_path = path.split('.')[0]
-    data = Jobs(path).small_df(invert=1, columns=parameters).to_csv(
-        f'{new_path}_data.csv', header=True)
-    settings = Jobs(path).settings_df().to_csv(f'{new_path}_settings.csv',
-                                               header=True)
+    new_path = archive.output_stem(path, makedirs=True)
+    convert_tab(path,
+                f'{new_path}_data.csv',
+                f'{new_path}_settings.csv',
+                columns=parameters)
+
+
+def worst_deviation(current, report):
+    """
+    Из двух отчетов CompoundBatch.deviation выбирает отчет с большим
+    отклонением, current может быть None
+    """
+    if current is None or report['max_abs'] > current['max_abs']:
+        return report
+    return current
+
+
+def file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def parse_file(path, parser, iformat, write=True):
+    """
+    Парсит один файл и записывает результат рядом с ним (write=True),
+    функция верхнего уровня, чтобы её можно было передать в пул процессов.
+    Для gaussian и orca возвращает ThermoRecord
+    """
+    if iformat == 'gaussian' or iformat == 'orca':
+        record = parser(path)
+        if write:
+            # Директории для файлов из архивов создаются только при записи
+            new_file_name = archive.output_stem(path, makedirs=True)
+            record.to_series().to_csv(path_or_buf=new_file_name + '.csv',
+                                      header=True)
+        return record
+    elif iformat == 'cosmo':
+        parser(path)
+
+
+def serial_parse(sources, parser, iformat, write=True):
+    """
+    Парсит файлы по очереди и возвращает тройки (файл, результат
+    parse_file, ошибка или None), как pool_parse
+    """
+    for source in sources:
+        try:
+            result = parse_file(source,
+                                parser=parser,
+                                iformat=iformat,
+                                write=write)
+        except Exception as err:
+            yield source, None, err
+        else:
+            yield source, result, None
+
+
+def pool_parse(sources, parser, iformat, jobs, write=True):
+    """
+    Парсит файлы в пуле процессов и возвращает тройки
+    (файл, результат parse_file, ошибка или None) по мере завершения.
+    В очереди держится не больше двух задач на процесс, чтобы файлы
+    из архивов не накапливались в памяти
+    """
+    workers = jobs or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+        for source in sources:
+            if len(pending) >= 2 * workers:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield (pending.pop(future), ) + _outcome(future)
+            future = executor.submit(parse_file,
+                                     source,
+                                     parser=parser,
+                                     iformat=iformat,
+                                     write=write)
+            pending[future] = source
+        for future in as_completed(pending):
+            yield (pending[future], ) + _outcome(future)
+
+
+def _outcome(future):
+    error = future.exception()
+    return (None if error else future.result()), error
 
 
 @click.group()
@@ -114,43 +203,166 @@ def cosmo_generator(template, temperature, n, file_name):
               default='gaussian',
               show_default=True,
               prompt='Choose program pls')
-def parsing(files, iformat):
+@click.option('--tail',
+              is_flag=True,
+              help='Read gaussian logs backward from the end of file')
+@click.option('--step',
+              type=int,
+              default=None,
+              help='Gaussian --Link1-- job step, default is the last freq step')
+@click.option('-j',
+              '--jobs',
+              type=click.IntRange(min=0),
+              default=1,
+              show_default=True,
+              help='Number of worker processes, 0 means one per CPU')
+@click.option('--no-cache',
+              is_flag=True,
+              help='Parse files without reading or writing the parse cache')
+@click.option('-o',
+              '--table',
+              type=click.Path(),
+              default=None,
+              help='Write one table for all files instead of a csv per file, '
+              f'format is chosen by extension: {", ".join(TABLE_FORMATS)}')
+def parsing(files, iformat, tail, step, jobs, no_cache, table):
     """
     """
-    if iformat == 'gaussian':
-        parser = gauspar.file_pars
-    elif iformat == 'orca':
-        parser = orpar.file_pars
+    if table and iformat == 'cosmo':
+        raise click.BadParameter('is supported only for gaussian and orca',
+                                 param_hint='--table')
+    if table and os.path.splitext(table)[1].lower() not in TABLE_FORMATS:
+        raise click.BadParameter(f'use one of {", ".join(TABLE_FORMATS)}',
+                                 param_hint='--table')
+    if iformat == 'gaussian' or iformat == 'orca':
+        parser = partial(cache.file_pars,
+                         qm_program=iformat,
+                         tail=tail,
+                         step=step,
+                         use_cache=not no_cache)
     elif iformat == 'cosmo':
         parser = cosmo_parsing
     else:
         click.secho(f'You choose wrong foromat', blink=True, bold=True)
-    with click.progressbar(files) as bar:
-        for f in bar:
-            new_file_name = os.path.join(ntpath.dirname(f),
-                                         ntpath.basename(f).split('.')[0])
-            try:
-                if iformat == 'gaussian' or iformat == 'orca':
-                    data = parser(f)
-                    data.to_csv(path_or_buf=new_file_name + '.csv',
-                                header=True)
-                elif iformat == 'cosmo':
-                    parser(f)
-            except Exception as err:
-                click.secho(f'Some trouble in {f}', blink=True, bold=True)
-                raise err
+    # Архивы разбираются потоково, число файлов в них заранее неизвестно
+    archives = [f for f in files if archive.is_archive(f)]
+    files = [f for f in files if not archive.is_archive(f)]
+    length = None if archives else len(files)
+    write = table is None
+    records = {}
+    if jobs == 1:
+        outcomes = serial_parse(chain(files, archive.expand(archives)),
+                                parser, iformat, write)
+    else:
+        # Самые большие файлы ставятся в очередь первыми, чтобы один
+        # огромный лог не задерживал весь пакет в конце
+        files = sorted(files, key=file_size, reverse=True)
+        outcomes = pool_parse(chain(files, archive.expand(archives)), parser,
+                              iformat, jobs, write)
+    failed = []
+    total = 0
+    with click.progressbar(outcomes, length=length) as bar:
+        for f, record, err in bar:
+            total += 1
+            if err is not None:
+                failed.append((f, err))
+            else:
+                records[cache.source_key(f)] = record
+    for f, err in failed:
+        click.secho(f'Some trouble in {f}: {err!r}', bold=True)
+    if table:
+        # Ключи таблицы - абсолютные пути, как в кэше парсинга, чтобы
+        # reaction --table работал из любой директории
+        write_table(records_frame(records), table)
+    if failed:
+        raise click.ClickException(f'{len(failed)} of {total} files failed')
+
+
+@cli1.command('cache')
+@click.argument('files', nargs=-1, type=click.Path())
+@click.option('--clear', is_flag=True, help='Remove all cached records')
+def parse_cache(files, clear):
+    """
+    Show parse cache statistics, FILES entries are invalidated
+    """
+    _cache = cache.default_cache()
+    if _cache is None:
+        click.secho('Parse cache is disabled by COSMORC_NO_CACHE', bold=True)
+        return
+    if clear:
+        click.echo(f'{_cache.invalidate()} records removed')
+    for f in files:
+        click.echo(f'{f}: {_cache.invalidate(f)} records removed')
+    click.echo(f'Cache: {_cache.path}')
+    for key, value in _cache.stats().items():
+        click.echo(f'{key}: {value}')
 
 
 # Work without COSMO
 @cli1.command()
 @click.argument('file', nargs=1, type=click.Path())
-def reaction(file):
+@click.option('--float32',
+              'single',
+              is_flag=True,
+              help='Evaluate and store Gibbs energy grids in float32 '
+              'relative to the electronic energy of each compound')
+@click.option('--table',
+              type=click.Path(exists=True, dir_okay=False),
+              multiple=True,
+              help='Take compound data from a table written by parsing -o '
+              'instead of parsing the files of compounds, may be repeated '
+              'to merge tables of several programs')
+@click.option('--network',
+              is_flag=True,
+              help='Compute all reactions with the same conditions at once '
+              'through one stoichiometry matrix')
+@click.option('--no-cache',
+              is_flag=True,
+              help='Parse files without reading or writing the parse cache')
+def reaction(file, single, table, network, no_cache):
     """
     """
     with open(file, 'r') as f:
         data = load(f, Loader=Loader)
 
-    compounds = [Compound.from_dict(i) for i in data['Compounds']]
+    precision = 'float32' if single else 'float64'
+    # Создаются только вещества, которые есть в реакциях, файлы
+    # веществ разбираются при первом расчете
+    used = {
+        name
+        for rx in data['Reactions']
+        for name in Reaction.compound_names(rx['reaction'])
+    }
+    entries = [i for i in data['Compounds'] if i.get('name') in used]
+    if table:
+        try:
+            compounds = Compound.from_table(table, entries)
+        except KeyError as err:
+            raise click.BadParameter(f'{err.args[0]}, it is missing in '
+                                     f'{", ".join(table)}',
+                                     param_hint='--table')
+    else:
+        compounds = [Compound.from_dict(i) for i in entries]
+    for compound in compounds:
+        compound.precision = precision
+        compound.use_cache = not no_cache
+    # Все вещества считаются одним векторизованным проходом на каждую
+    # сетку условий, Reaction берет готовые значения из кэшей веществ.
+    # Пакет создается при первой такой реакции: его конструктор
+    # разбирает файлы всех веществ, а ReactionNetwork строит свой пакет
+    batch = None
+    deviation = None
+    # Отклонение float32 оценивается один раз на сетку условий
+    reported = set()
+    # В режиме network реакции с одинаковыми условиями считаются
+    # одной матрицей при первой из них, см. ReactionNetwork
+    groups = {}
+    for rx in data['Reactions']:
+        if network and not rx.get('cosmo', 0):
+            key = (rx['conditions']['pressure'],
+                   rx['conditions']['temperature'])
+            groups.setdefault(key, []).append(rx)
+    results = {}
 
     #TODO Fixit
     with click.progressbar(data['Reactions']) as bar:
@@ -170,6 +382,30 @@ def reaction(file):
                 else:
                     p = condition_pars(rx['conditions']['pressure'])
                     t = condition_pars(rx['conditions']['temperature'])
+                    key = (rx['conditions']['pressure'],
+                           rx['conditions']['temperature'])
+                    if network:
+                        if key not in results:
+                            rx_network = ReactionNetwork(
+                                [(i['name'], i['reaction'])
+                                 for i in groups[key]],
+                                compounds,
+                                dtype=precision)
+                            results[key] = rx_network.g_reaction(t, p)
+                            if single:
+                                deviation = worst_deviation(
+                                    deviation,
+                                    rx_network.batch.deviation(t, p))
+                        results[key][rx['name']].to_csv(path_or_buf=file_name,
+                                                        header=True)
+                        continue
+                    if batch is None:
+                        batch = CompoundBatch(compounds, dtype=precision)
+                    if single and key not in reported:
+                        reported.add(key)
+                        deviation = worst_deviation(deviation,
+                                                    batch.deviation(t, p))
+                    batch.prime(t, p)
                     # file_name = file + '.csv'
 
                     _ = Reaction(name=rx['name'],
@@ -186,6 +422,13 @@ def reaction(file):
                 print(f'trouble in {rx}')
                 raise err
 
+    if deviation is not None:
+        click.echo(f"float32: max deviation from float64 "
+                   f"{deviation['max_abs']:.3g} J/mol ({deviation['compound']}"
+                   f", T={deviation['temperature']}, "
+                   f"P={deviation['pressure']}; "
+                   f"{deviation['sample']} compounds sampled)")
+
 
 cli = click.CommandCollection(sources=[cli1])
 
@@ -0,0 +1,28 @@
+import os
+
+import pytest
+
+from benchmarks.corpus import write_corpus
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+
+# Размеры файлов benchmarks.corpus, на которых получены эталоны в DATA_DIR
+CORPUS_SIZES = {'natoms': 5, 'opt_steps': 3}
+
+
+@pytest.fixture(autouse=True)
+def no_default_cache(monkeypatch):
+    # Тесты не пишут в общий кэш парсинга ~/.cache/CosmOrc
+    monkeypatch.setenv('COSMORC_NO_CACHE', '1')
+
+
+@pytest.fixture(scope='session')
+def corpus(tmp_path_factory):
+    """
+    Пути к синтетическим файлам gaussian и orca, по два файла каждого типа
+    """
+    directory = str(tmp_path_factory.mktemp('corpus'))
+    return {
+        kind: write_corpus(directory, kind, 2, **CORPUS_SIZES)
+        for kind in ('gaussian', 'orca')
+    }
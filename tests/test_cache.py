@@ -0,0 +1,88 @@
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+import CosmOrc.cache as cache
+from CosmOrc.cache import ParseCache
+
+
+@pytest.fixture
+def log_file(corpus, tmp_path):
+    # Копия, которую тесты могут изменять
+    path = str(tmp_path / 'gaussian_0.log')
+    shutil.copy(corpus['gaussian'][0], path)
+    return path
+
+
+@pytest.fixture
+def parse_cache(tmp_path):
+    return ParseCache(str(tmp_path / 'cache' / cache.CACHE_FILE))
+
+
+def test_hit_after_put(parse_cache, log_file):
+    first = parse_cache.file_pars(log_file)
+    assert (parse_cache.hits, parse_cache.misses) == (0, 1)
+    second = parse_cache.file_pars(log_file)
+    assert (parse_cache.hits, parse_cache.misses) == (1, 1)
+    pd.testing.assert_series_equal(second.to_series(), first.to_series())
+
+
+def test_miss_after_change(parse_cache, log_file):
+    parse_cache.file_pars(log_file)
+    with open(log_file, 'a') as data_file:
+        data_file.write(' Normal termination of Gaussian 16\n')
+    parse_cache.file_pars(log_file)
+    assert (parse_cache.hits, parse_cache.misses) == (0, 2)
+
+
+def test_miss_after_touch(parse_cache, log_file):
+    parse_cache.file_pars(log_file)
+    stat = os.stat(log_file)
+    os.utime(log_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    parse_cache.file_pars(log_file)
+    assert (parse_cache.hits, parse_cache.misses) == (0, 2)
+
+
+def test_miss_after_parser_version(parse_cache, log_file, monkeypatch):
+    parse_cache.file_pars(log_file)
+    monkeypatch.setattr(cache, 'PARSER_VERSION', cache.PARSER_VERSION + 1)
+    parse_cache.file_pars(log_file)
+    assert (parse_cache.hits, parse_cache.misses) == (0, 2)
+
+
+def test_options_are_separate(parse_cache, log_file):
+    parse_cache.file_pars(log_file)
+    parse_cache.file_pars(log_file, tail=True)
+    assert (parse_cache.hits, parse_cache.misses) == (0, 2)
+    assert set(parse_cache.records(qm_program='gaussian')) == {
+        cache.source_key(log_file)
+    }
+
+
+def test_stats_are_shared(parse_cache, log_file):
+    parse_cache.file_pars(log_file)
+    parse_cache.file_pars(log_file)
+    parse_cache.stats()
+    other = ParseCache(parse_cache.path)
+    other.file_pars(log_file)
+    stats = other.stats()
+    assert (stats['entries'], stats['hits'], stats['misses']) == (1, 2, 1)
+
+
+def test_missing_file_raises(parse_cache, tmp_path):
+    with pytest.raises(OSError):
+        parse_cache.file_pars(str(tmp_path / 'missing.log'))
+
+
+def test_broken_cache_falls_back(corpus, tmp_path, monkeypatch):
+    directory = tmp_path / 'cache'
+    directory.mkdir()
+    (directory / cache.CACHE_FILE).write_text('not a database\n' * 100)
+    monkeypatch.delenv('COSMORC_NO_CACHE')
+    monkeypatch.setenv('COSMORC_CACHE_DIR', str(directory))
+    monkeypatch.setattr(cache, '_default_cache', None)
+    assert cache.file_pars(corpus['gaussian'][0]).natoms == 5
+    with pytest.raises(OSError):
+        cache.file_pars(str(tmp_path / 'missing.log'))
@@ -0,0 +1,68 @@
+from functools import partial
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import CosmOrc.cospar as cospar
+from CosmOrc.cospar import Jobs, JobIndex, convert_tab
+
+from benchmarks.corpus import cosmo_tab
+
+COLUMNS = ('Gsolv', 'ln(gamma)', 'Nr')
+
+
+@pytest.fixture(scope='module')
+def tab_file(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('cosmo') / 'cosmo.tab')
+    with open(path, 'w') as data_file:
+        data_file.write(cosmo_tab(jobs=40, compounds=6))
+    return path
+
+
+@pytest.mark.parametrize('buffer_size', [cospar.SPOOL_BUFFER_SIZE, 64])
+def test_convert_tab_csv(tab_file, tmp_path, monkeypatch, buffer_size):
+    # Маленький буфер заставляет писать строки во временный файл
+    monkeypatch.setattr(
+        cospar, '_CsvDataWriter',
+        partial(cospar._CsvDataWriter, buffer_size=buffer_size))
+    data_path = str(tmp_path / 'data.csv')
+    settings_path = str(tmp_path / 'settings.csv')
+    convert_tab(tab_file, data_path, settings_path, columns=COLUMNS)
+
+    jobs = Jobs(tab_file)
+    with open(data_path) as data_file:
+        assert data_file.read() == jobs.small_df(list(COLUMNS),
+                                                 invert=1).to_csv()
+    with open(settings_path) as data_file:
+        assert data_file.read() == jobs.settings_df().to_csv()
+
+    data = pd.read_csv(data_path, index_col=[0, 1])
+    full = jobs.full_df(invert=1).loc[:, list(COLUMNS)]
+    assert data.index.equals(full.sort_index(level=0).index)
+    np.testing.assert_array_equal(
+        data.values,
+        full.sort_index(level=0).values)
+
+
+def test_settings_units(tab_file):
+    jobs = Jobs(tab_file)
+    settings = {x.name: x.unit for x in jobs.data[0].settings}
+    assert settings == {'T=': 'K', '1': '%', '2': '%'}
+    assert cospar.settings_values(
+        'Settings  job 1 : T= 298.15 K ; p= 1.0 ; x(1)= 1.0 ;')[2] == {
+            'T=': 'K',
+            'p=': None,
+            '1': '%'
+        }
+
+
+def test_job_index(tab_file):
+    jobs = Jobs(tab_file)
+    index = JobIndex(tab_file)
+    assert len(index) == len(jobs.data)
+    pd.testing.assert_frame_equal(index.where('T=', 300.0).full_df(),
+                                  jobs.full_df().loc[[
+                                      job.job_indx for job in jobs.data
+                                      if job.setting_values['T='] == 300.0
+                                  ]])
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from CosmOrc.batch import CompoundBatch
+from CosmOrc.network import ReactionNetwork
+from CosmOrc.reactions import Compound, Reaction
+
+# ReactionNetwork суммирует реагенты и продукты в одной сумме, а
+# Reaction.g_reaction - по отдельности, поэтому при G ~ 1e9 Дж/моль
+# результаты отличаются на округление, порядка 1e-6 Дж/моль
+ATOL = 1e-5
+
+# Отклонение float32 от float64, Дж/моль (ожидается порядка 0.1)
+FLOAT32_ATOL = 1.0
+
+REACTIONS = [('d', '2*A = B'), ('e', 'A + B = 0.5*C'), ('f', 'C = 3*A'),
+             ('g', 'A + D = C')]
+
+
+@pytest.fixture
+def compounds(corpus):
+    paths = corpus['gaussian'] + corpus['orca']
+    return [
+        Compound(qm_program='orca' if path.endswith('.out') else 'gaussian',
+                 path_to_file=path,
+                 name=name) for name, path in zip('ABCD', paths)
+    ]
+
+
+@pytest.fixture
+def conditions():
+    return np.arange(250, 400, 10.0), np.array([0.5, 1, 2])
+
+
+def legacy(compounds, conditions):
+    temperature, pressure = conditions
+    return {
+        name: Reaction(name=name,
+                       compounds=compounds,
+                       reaction=reaction,
+                       condition={
+                           'temperature': temperature,
+                           'pressure': pressure
+                       }).g_reaction()
+        for name, reaction in REACTIONS
+    }
+
+
+def test_network_matches_reactions(compounds, conditions):
+    expected = legacy(compounds, conditions)
+    network = ReactionNetwork(REACTIONS, compounds)
+    result = network.g_reaction(*conditions)
+    for name, _ in REACTIONS:
+        assert result[name].index.equals(expected[name].index)
+        assert result[name].columns.equals(expected[name].columns)
+        np.testing.assert_allclose(result[name].values.astype(float),
+                                   expected[name].values.astype(float),
+                                   rtol=0,
+                                   atol=ATOL)
+
+
+def test_network_float32(compounds, conditions):
+    expected = ReactionNetwork(REACTIONS, compounds).g_reactions(*conditions)
+    network = ReactionNetwork(REACTIONS, compounds, dtype='float32')
+    result = network.g_reactions(*conditions)
+    assert result.dtype == np.float64
+    np.testing.assert_allclose(result, expected, rtol=0, atol=FLOAT32_ATOL)
+    report = CompoundBatch(compounds, dtype='float32').deviation(*conditions)
+    assert report['sample'] == len(compounds)
+    assert report['max_abs'] < FLOAT32_ATOL
+
+
+def test_stoichiometry(compounds):
+    network = ReactionNetwork(REACTIONS, compounds)
+    matrix = network.matrix()
+    assert matrix.loc['d', 'A'] == -2 and matrix.loc['d', 'B'] == 1
+    assert matrix.loc['e', 'C'] == 0.5
+    assert ReactionNetwork.stoichiometry('A + A = B') == {'A': -2, 'B': 1}
+    with pytest.raises(KeyError):
+        ReactionNetwork([('x', 'A = E')], compounds)
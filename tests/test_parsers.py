@@ -0,0 +1,102 @@
+"""
+Сравнение gauspar.file_pars и orpar.file_pars с исходной версией парсеров.
+Эталоны в tests/data - pd.Series, которые file_pars возвращали до перехода
+на ThermoRecord, записанные через to_csv для файлов benchmarks.corpus
+(см. CORPUS_SIZES, seed - номер файла)
+"""
+import gzip
+import os
+import shutil
+import tarfile
+import zipfile
+
+import pandas as pd
+import pytest
+
+import CosmOrc.archive as archive
+import CosmOrc.cache as cache
+import CosmOrc.gauspar as gauspar
+import CosmOrc.orpar as orpar
+
+from tests.conftest import DATA_DIR
+
+PARSERS = {'gaussian': gauspar.file_pars, 'orca': orpar.file_pars}
+
+
+def _value(value):
+    # Значения эталона прочитаны из csv строками
+    try:
+        return float(value)
+    except ValueError:
+        return str(value)
+
+
+def assert_legacy(record, file_name):
+    """
+    Проверяет, что запись совпадает с эталоном для файла file_name.
+    Порядок строк ThermoRecord.to_series отличается от исходного,
+    поэтому значения сравниваются по именам, частоты - как набор
+    """
+    expected = pd.read_csv(os.path.join(DATA_DIR,
+                                        file_name.split('.')[0] + '.csv'),
+                           index_col=0).iloc[:, 0]
+    series = record.to_series()
+    assert sorted(series['freq.'].astype(float)) == sorted(
+        expected['freq.'].astype(float))
+    series = series.drop('freq.')
+    expected = expected.drop('freq.')
+    assert sorted(series.index) == sorted(expected.index)
+    for name, value in expected.items():
+        assert _value(str(series[name])) == _value(value), name
+
+
+@pytest.mark.parametrize('kind', sorted(PARSERS))
+def test_plain(corpus, kind):
+    for path in corpus[kind]:
+        assert_legacy(PARSERS[kind](path), os.path.basename(path))
+
+
+def test_gaussian_tail(corpus):
+    for path in corpus['gaussian']:
+        assert_legacy(gauspar.file_pars(path, tail=True),
+                      os.path.basename(path))
+
+
+@pytest.mark.parametrize('kind', sorted(PARSERS))
+def test_compressed(corpus, kind, tmp_path):
+    for path in corpus[kind]:
+        compressed = str(tmp_path / (os.path.basename(path) + '.gz'))
+        with open(path, 'rb') as src, gzip.open(compressed, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        assert_legacy(PARSERS[kind](compressed), os.path.basename(path))
+
+
+@pytest.mark.parametrize('suffix', ['.tar.gz', '.zip'])
+@pytest.mark.parametrize('kind', sorted(PARSERS))
+def test_archived(corpus, kind, suffix, tmp_path):
+    path = str(tmp_path / ('project' + suffix))
+    if suffix == '.zip':
+        with zipfile.ZipFile(path, 'w') as data:
+            for name in corpus[kind]:
+                data.write(name, 'opt/' + os.path.basename(name))
+    else:
+        with tarfile.open(path, 'w:gz') as data:
+            for name in corpus[kind]:
+                data.add(name, 'opt/' + os.path.basename(name))
+    sources = list(archive.expand([path]))
+    assert len(sources) == len(corpus[kind])
+    for source in sources:
+        _, member = archive.split_source(source)
+        assert_legacy(PARSERS[kind](source), os.path.basename(member))
+
+
+@pytest.mark.parametrize('kind', sorted(PARSERS))
+def test_cached(corpus, kind, tmp_path, monkeypatch):
+    monkeypatch.delenv('COSMORC_NO_CACHE')
+    monkeypatch.setenv('COSMORC_CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(cache, '_default_cache', None)
+    for _ in range(2):
+        for path in corpus[kind]:
+            assert_legacy(cache.file_pars(path, qm_program=kind),
+                          os.path.basename(path))
+    assert cache.default_cache().hits == len(corpus[kind])